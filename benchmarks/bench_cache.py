@@ -0,0 +1,72 @@
+# sqlite cache backend benchmarks: the peewee model path vs direct sqlite3 statements on the same table.
+#   python2 benchmarks/bench_cache.py [--number 2000] [--repeat 5] [--size 2000]
+#
+# Both backends share one connection and one table, so the difference is query building, field
+# conversion and model instantiation. Numbers are the best of --repeat runs, in microseconds per call.
+from __future__ import print_function
+
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+
+def payload(size):
+    # roughly the shape of a cached api page
+    items = []
+    while len(repr(items)) < size:
+        idx = len(items)
+        items.append({'id': 1000 + idx, 'title': u'Title {}'.format(idx), 'duration': 2400, 'image_url': 'https://example.com/{}.jpg'.format(idx)})
+    return {'data': items, 'paginator': {'total_pages': 1}}
+
+def bench(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000000
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache backend benchmarks')
+    parser.add_argument('--number', type=int, default=2000, help='calls per timing')
+    parser.add_argument('--repeat', type=int, default=5, help='timings per operation (best is kept)')
+    parser.add_argument('--size', type=int, default=2000, help='approximate payload size in bytes')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='kodi-bench-')
+    os.environ['BENCH_KODI_ROOT'] = root
+    sys.path.insert(0, STUBS_DIR)
+
+    try:
+        from resources.lib.matthuisman import cache, database
+
+        value = payload(args.size)
+        keys  = ['bench.key.{}'.format(i) for i in range(args.number)]
+        now   = 0
+
+        print('{:<10} {:>10} {:>10} {:>10} {:>10}'.format('backend', 'set us', 'hit us', 'miss us', 'delete us'))
+
+        for name, backend in (('peewee', cache.PeeweeBackend()), ('sqlite', cache.SqliteBackend())):
+            backend.truncate()
+            state = {'i': 0}
+
+            def _next():
+                state['i'] = (state['i'] + 1) % len(keys)
+                return keys[state['i']]
+
+            set_us    = bench(lambda: backend.set(_next(), value, 2**31, 2**31, 0, ''), args.number, args.repeat)
+            hit_us    = bench(lambda: backend.get(_next(), now), args.number, args.repeat)
+            miss_us   = bench(lambda: backend.get('missing' + _next(), now), args.number, args.repeat)
+            delete_us = bench(lambda: backend.delete(_next()), args.number, 1)
+
+            print('{:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(name, set_us, hit_us, miss_us, delete_us))
+
+        database.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
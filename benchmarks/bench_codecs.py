@@ -0,0 +1,92 @@
+# Value codec benchmarks: encoded size and encode/decode time per serializer + compressor for API payloads.
+#   python2 benchmarks/bench_codecs.py [--number 200] [--fixtures recorded/]
+#
+# Payloads are the stand-in fixtures (raw and as the api caches them after projection), round tripped through
+# json so strings are unicode like real responses. --fixtures adds every *.json file in a directory, eg. responses
+# recorded from the real API. "auto" is what the caches use; "legacy" is the protocol 0 pickle mem_cache used to store.
+from __future__ import print_function
+
+import os
+import sys
+import json
+import timeit
+import argparse
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, STUBS_DIR)
+
+from benchmarks import fixtures
+from resources.lib import projection
+from resources.lib.matthuisman import codec
+
+def payloads(fixtures_dir=None):
+    def api(data):
+        return json.loads(json.dumps(data))
+
+    rows = [
+        ('categories',      api(fixtures.categories())),
+        ('categories proj', projection.categories(api(fixtures.categories())['data'])),
+        ('featured',        api(fixtures.featured())),
+        ('featured proj',   projection.featured(api(fixtures.featured()))),
+        ('media page',      api(fixtures.filter_media())),
+        ('sections',        api(fixtures.sections())),
+        ('series',          api(fixtures.series(1001))),
+    ]
+
+    if fixtures_dir:
+        for file_name in sorted(os.listdir(fixtures_dir)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(fixtures_dir, file_name)) as f:
+                    rows.append((file_name[:-5], json.load(f)))
+
+    return rows
+
+def codecs():
+    rows = [('legacy', lambda value: pickle.dumps(value), pickle.loads)]
+
+    for serializer in sorted(codec.SERIALIZERS):
+        for compressor in sorted(codec.COMPRESSORS):
+            rows.append((serializer + compressor, lambda value, s=serializer, c=compressor: codec.encode(value, s, c), codec.decode))
+
+    rows.append(('auto', codec.encode, codec.decode))
+    return rows
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Value codec benchmarks')
+    parser.add_argument('--number', type=int, default=200, help='calls per timing')
+    parser.add_argument('--fixtures', help='directory of recorded API responses (*.json)')
+    args = parser.parse_args()
+
+    print('codecs: {} = serializer (p pickle, m marshal, j json) + compressor (- none, z zlib{})\n'.format(
+        ', '.join(sorted(codec.SERIALIZERS)), ', l lz4' if 'l' in codec.COMPRESSORS else ''))
+
+    for name, value in payloads(args.fixtures):
+        print('{:<16} {:>9} {:>10} {:>10}'.format(name, 'bytes', 'enc ms', 'dec ms'))
+
+        for codec_name, encode, decode in codecs():
+            try:
+                data = encode(value)
+            except (TypeError, ValueError) as e:
+                print('  {:<14} {}'.format(codec_name, e))
+                continue
+
+            encode_ms = bench(lambda: encode(value), args.number)
+            decode_ms = bench(lambda: decode(data), args.number)
+            print('  {:<14} {:>9} {:>10.3f} {:>10.3f}'.format(codec_name, len(data), encode_ms, decode_ms))
+
+        print('')
+
+if __name__ == '__main__':
+    main()
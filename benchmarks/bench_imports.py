@@ -0,0 +1,162 @@
+# Cold-start import cost: which modules each route imports and how long each one takes.
+#   python2 benchmarks/bench_imports.py [--runs 5] [--top 25] [--route index --route play]
+#
+# Every run is a fresh interpreter, so the numbers include reading .pyc files from disk. Run it on
+# the target device (eg. a Raspberry Pi) with warm .pyc files for numbers that match what users see.
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.bench_routes import ROUTES, median
+
+# modules that are worth keeping off the routes that don't need them
+HEAVY = ['requests', 'resources.lib.matthuisman.peewee', 'resources.lib.pycaption', 'resources.lib.matthuisman.inputstream', 'resources.lib.mirror']
+
+class ImportTimer(object):
+    # Times every import statement. A module's self time excludes the imports it triggers.
+    def __init__(self):
+        self.times = {}
+        self._stack = []
+
+        try:
+            import __builtin__ as builtins
+        except ImportError:
+            import builtins
+
+        self._builtins = builtins
+        self._import   = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, *args, **kwargs):
+        # "from . import a, b, c" loads several modules in one statement, so time them one at a time
+        if len(args) >= 3 and args[2] and len(args[2]) > 1 and not isinstance(args[2], str):
+            for item in args[2]:
+                self._timed_import(name, args[0], args[1], (item,), *args[3:])
+
+        before = set(sys.modules)
+        self._stack.append([time.time(), 0.0])
+
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            start, children = self._stack.pop()
+            elapsed = time.time() - start
+
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+            # py2 implicit relative imports leave None placeholders in sys.modules
+            loaded = [x for x in set(sys.modules) - before if sys.modules[x] is not None and x not in self.times]
+            if loaded:
+                # the deepest new module is the one this statement asked for, its parents come along with it
+                module = max(loaded, key=lambda x: x.count('.'))
+                self.times[module] = (elapsed, elapsed - children)
+
+    def stop(self):
+        self._builtins.__import__ = self._import
+
+def child(url, api_url, token):
+    timer = ImportTimer()
+    sys.path.insert(0, STUBS_DIR)
+
+    start = time.time()
+
+    import resources.lib.constants as constants
+    constants.API_URL = api_url + '{}'
+
+    from resources.lib.plugin import plugin
+    from resources.lib.matthuisman import userdata
+    import xbmcaddon
+
+    import_time = time.time() - start
+
+    if token:
+        userdata.set('token', token)
+
+    sys.argv = ['plugin://{}/'.format(xbmcaddon.ADDON_ID), '1', url]
+
+    start = time.time()
+    plugin.dispatch(url)
+    dispatch_time = time.time() - start
+
+    timer.stop()
+
+    print(json.dumps({
+        'import': import_time,
+        'dispatch': dispatch_time,
+        'modules': timer.times,
+        'heavy': [x for x in HEAVY if sys.modules.get(x)],
+    }))
+
+def run_child(url, api_url, token):
+    root = tempfile.mkdtemp(prefix='kodi-bench-')
+    env  = dict(os.environ, BENCH_KODI_ROOT=root)
+
+    try:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', url,
+            '--api-url', api_url, '--token', token or ''], env=env)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start import benchmarks')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per route')
+    parser.add_argument('--top', type=int, default=25, help='modules to list by self time')
+    parser.add_argument('--route', action='append', choices=[r[0] for r in ROUTES], help='only run these routes')
+    parser.add_argument('--api-url', help='use an already running API instead of starting the stand-in')
+    parser.add_argument('--token', default='stand-in-token', help='auth token to log in with (empty for logged out)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        return child(args.child, args.api_url, args.token)
+
+    server = None
+    if not args.api_url:
+        from benchmarks.server import StandInServer
+        server = StandInServer().start()
+        args.api_url = server.url
+
+    routes  = [r for r in ROUTES if not args.route or r[0] in args.route]
+    modules = {}
+
+    print('{:<12} {:>10} {:>12} {:>8}  {}'.format('route', 'import ms', 'dispatch ms', 'modules', 'heavy modules loaded'))
+
+    try:
+        for name, url in routes:
+            results = [run_child(url, args.api_url, args.token) for i in range(args.runs)]
+
+            for result in results:
+                for module, times in result['modules'].items():
+                    modules.setdefault(module, []).append(times)
+
+            print('{:<12} {:>10.1f} {:>12.1f} {:>8}  {}'.format(name, median([r['import'] for r in results]) * 1000,
+                median([r['dispatch'] for r in results]) * 1000, len(results[0]['modules']),
+                ', '.join(x.split('.')[-1] for x in results[0]['heavy']) or '-'))
+    finally:
+        if server:
+            server.stop()
+
+    print('\n{:<50} {:>10} {:>10}'.format('module (all routes)', 'self ms', 'incl ms'))
+
+    rows = [(module, median([t[1] for t in times]), median([t[0] for t in times])) for module, times in modules.items()]
+    for module, self_time, incl_time in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print('{:<50} {:>10.2f} {:>10.2f}'.format(module, self_time * 1000, incl_time * 1000))
+
+if __name__ == '__main__':
+    main()
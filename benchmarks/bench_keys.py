@@ -0,0 +1,78 @@
+# Cache key building cost per cached call: the old 6 character key vs keys.build.
+#   python2 benchmarks/bench_keys.py [--number 20000] [--repeat 5]
+#
+# Every cached call builds its key before looking anything up, so this runs on every hit.
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+import hashlib
+import argparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, STUBS_DIR)
+
+from resources.lib.api import API
+from resources.lib.matthuisman import keys
+
+CALLS = [
+    ('categories',   (API(),), {}),
+    ('collections',  (API(),), {'page': 3}),
+    ('filter_media', (API(), 'category', u'Space & Cosmos'), {'page': 2}),
+    ('filter_media', (API(), 'bookmarked'), {'page': 1}),
+]
+
+def legacy_key(func_name, *args, **kwargs):
+    # the key mem_cache built before keys.build: sorted str() of primitives, md5 cut to 6 base64 characters
+    key = func_name
+
+    def to_str(item):
+        try:
+            return item.encode('utf-8')
+        except:
+            return str(item)
+
+    def is_primitive(item):
+        return type(item) in (int, str, dict, list, bool, float, unicode)
+
+    for k in sorted(args):
+        if is_primitive(k):
+            key += to_str(k)
+
+    for k in sorted(kwargs):
+        if is_primitive(kwargs[k]):
+            key += to_str(k) + to_str(kwargs[k])
+
+    return hashlib.md5(str(key)).digest().encode('base64')[:6]
+
+def bench(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000000
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache key benchmarks')
+    parser.add_argument('--number', type=int, default=20000, help='keys per timing')
+    parser.add_argument('--repeat', type=int, default=5, help='timings per case (best is kept)')
+    args = parser.parse_args()
+
+    print('digest: {}\n'.format('xxh64' if keys.xxhash else 'md5 (pip install xxhash for xxh64)'))
+    print('{:<14} {:>10} {:>10} {:>10}'.format('call', 'legacy us', 'build us', 'checked us'))
+
+    for name, call_args, call_kwargs in CALLS:
+        func = getattr(API, name)
+
+        legacy  = bench(lambda: legacy_key(name, *call_args, **call_kwargs), args.number, args.repeat)
+        build   = bench(lambda: keys.build(func, *call_args, **call_kwargs), args.number, args.repeat)
+
+        keys.CACHE_KEY_CHECK = True
+        checked = bench(lambda: keys.build(func, *call_args, **call_kwargs), args.number, args.repeat)
+        keys.CACHE_KEY_CHECK = False
+
+        print('{:<14} {:>10.2f} {:>10.2f} {:>10.2f}'.format(name, legacy, build, checked))
+
+if __name__ == '__main__':
+    main()
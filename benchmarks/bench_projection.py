@@ -0,0 +1,48 @@
+# Compares cache payloads for raw API rows against projected rows.
+#   python benchmarks/bench_projection.py
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks import fixtures
+from resources.lib import projection
+
+NUMBER = 200
+
+def measure(name, raw, projected):
+    # mem_cache stores each row as a binary pickle in its own window property
+    raw_blob  = pickle.dumps(raw, pickle.HIGHEST_PROTOCOL)
+    proj_blob = pickle.dumps(projected, pickle.HIGHEST_PROTOCOL)
+
+    raw_time  = min(timeit.repeat(lambda: pickle.dumps(raw, pickle.HIGHEST_PROTOCOL), number=NUMBER, repeat=3)) / NUMBER
+    proj_time = min(timeit.repeat(lambda: pickle.dumps(projected, pickle.HIGHEST_PROTOCOL), number=NUMBER, repeat=3)) / NUMBER
+    load_time = min(timeit.repeat(lambda: pickle.loads(proj_blob), number=NUMBER, repeat=3)) / NUMBER
+    raw_load  = min(timeit.repeat(lambda: pickle.loads(raw_blob), number=NUMBER, repeat=3)) / NUMBER
+
+    print('{:<12} {:>9} {:>9} {:>6.1f}% {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(name, len(raw_blob), len(proj_blob),
+        100.0 * (1 - float(len(proj_blob)) / len(raw_blob)), raw_time * 1000, proj_time * 1000, raw_load * 1000, load_time * 1000))
+
+def main():
+    categories  = fixtures.categories()['data']
+    featured    = fixtures.featured()
+    collections = fixtures.collections()
+
+    print('{:<12} {:>9} {:>9} {:>7} {:>9} {:>9} {:>9} {:>9}'.format('payload', 'raw B', 'proj B', 'saved', 'dump ms', 'pdump ms', 'load ms', 'pload ms'))
+    measure('categories', categories, projection.categories(categories))
+    measure('featured', featured, projection.featured(featured))
+    measure('collections', collections, projection.paginated(collections, projection.collection))
+
+    cost = min(timeit.repeat(lambda: projection.featured(featured), number=NUMBER, repeat=3)) / NUMBER
+    print('\nprojection cost (featured): {:.3f} ms'.format(cost * 1000))
+
+if __name__ == '__main__':
+    main()
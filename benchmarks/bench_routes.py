@@ -0,0 +1,211 @@
+# End-to-end route benchmarks: dispatches real plugin urls through router.dispatch against the local API stand-in.
+#   python2 benchmarks/bench_routes.py [--runs 3] [--warm 5] [--latency 50] [--route categories --route play]
+#
+# Cold numbers come from a fresh interpreter with an empty profile (no sqlite cache, no window properties).
+# Warm numbers repeat the dispatch in that same interpreter, the way Kodi keeps the profile and home window
+# between invocations. HTTP and sqlite counts include background work the dispatch started (prefetch, refreshes).
+# requests, peewee and the cache module are imported up front to count calls, so their import cost shows under import ms
+# rather than cold ms; bench_imports.py measures what each route actually imports.
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+
+ROUTES = [
+    ('index',      ''),
+    ('categories', '?_=categories'),
+    ('media',      '?_=media&filterby=category&term=space&title=Space'),
+    ('search',     '?_=search&query=space'),
+    ('series',     '?_=series&id=1001'),
+    ('play',       '?_=play&id=1001'),
+]
+
+SETTLE_TIMEOUT = 10
+
+class Counter(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'http': 0, 'sql': 0}
+
+def _install_hooks(counter):
+    import requests.adapters
+    from resources.lib.matthuisman import peewee
+
+    send = requests.adapters.HTTPAdapter.send
+    def counted_send(self, *args, **kwargs):
+        counter.add('http')
+        return send(self, *args, **kwargs)
+    requests.adapters.HTTPAdapter.send = counted_send
+
+    execute_sql = peewee.Database.execute_sql
+    def counted_execute_sql(self, *args, **kwargs):
+        counter.add('sql')
+        return execute_sql(self, *args, **kwargs)
+    peewee.Database.execute_sql = counted_execute_sql
+
+    # the sqlite cache backend goes straight to sqlite3, so count its statements too
+    from resources.lib.matthuisman import cache
+
+    cache_execute = cache.SqliteBackend._execute
+    def counted_cache_execute(self, *args, **kwargs):
+        counter.add('sql')
+        return cache_execute(self, *args, **kwargs)
+    cache.SqliteBackend._execute = counted_cache_execute
+
+def _settle():
+    # wait for prefetch / refresh / subtitle threads the dispatch left behind
+    deadline = time.time() + SETTLE_TIMEOUT
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(max(0, deadline - time.time()))
+
+def _peak_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024 if sys.platform == 'darwin' else 1024.0)
+
+def child(url, api_url, warm, token):
+    sys.path.insert(0, STUBS_DIR)
+
+    import resources.lib.constants as constants
+    constants.API_URL = api_url + '{}'
+
+    start = time.time()
+    from resources.lib.plugin import plugin
+    from resources.lib.matthuisman import userdata
+    import xbmcplugin, xbmcaddon
+    import_time = time.time() - start
+
+    if token:
+        userdata.set('token', token)
+
+    counter = Counter()
+    _install_hooks(counter)
+
+    sys.argv = ['plugin://{}/'.format(xbmcaddon.ADDON_ID), '1', url]
+
+    runs = []
+    for i in range(1 + warm):
+        del xbmcplugin.items[:]
+        del xbmcplugin.resolved[:]
+        counter.reset()
+
+        start = time.time()
+        plugin.dispatch(url)
+        elapsed = time.time() - start
+
+        _settle()
+        runs.append({'time': elapsed, 'http': counter.counts['http'], 'sql': counter.counts['sql'],
+            'items': len(xbmcplugin.items) + len(xbmcplugin.resolved), 'peak_mb': _peak_mb()})
+
+    print(json.dumps({'import': import_time, 'runs': runs}))
+
+def run_child(url, api_url, warm, token):
+    root = tempfile.mkdtemp(prefix='kodi-bench-')
+    env  = dict(os.environ, BENCH_KODI_ROOT=root)
+
+    try:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', url,
+            '--api-url', api_url, '--warm', str(warm), '--token', token or ''], env=env)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return 0
+
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid-1] + values[mid]) / 2.0
+
+def summarise(name, results):
+    cold = [r['runs'][0] for r in results]
+    warm = [run for r in results for run in r['runs'][1:]]
+
+    return {
+        'route':     name,
+        'import_ms': median([r['import'] for r in results]) * 1000,
+        'cold_ms':   median([r['time'] for r in cold]) * 1000,
+        'warm_ms':   median([r['time'] for r in warm]) * 1000,
+        'cold_http': median([r['http'] for r in cold]),
+        'warm_http': median([r['http'] for r in warm]),
+        'cold_sql':  median([r['sql'] for r in cold]),
+        'warm_sql':  median([r['sql'] for r in warm]),
+        'items':     median([r['items'] for r in cold]),
+        'peak_mb':   max(run['peak_mb'] for r in results for run in r['runs']),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Route latency benchmarks')
+    parser.add_argument('--runs', type=int, default=3, help='cold runs (fresh interpreter + profile) per route')
+    parser.add_argument('--warm', type=int, default=5, help='warm dispatches after each cold run')
+    parser.add_argument('--route', action='append', choices=[r[0] for r in ROUTES], help='only run these routes')
+    parser.add_argument('--api-url', help='use an already running API instead of starting the stand-in')
+    parser.add_argument('--latency', type=float, default=0, help='stand-in latency in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='stand-in jitter in ms')
+    parser.add_argument('--token', default='stand-in-token', help='auth token to log in with (empty for logged out)')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        return child(args.child, args.api_url, args.warm, args.token)
+
+    server = None
+    if not args.api_url:
+        from benchmarks.server import StandInServer, Config
+        server = StandInServer(config=Config(latency=args.latency, jitter=args.jitter)).start()
+        args.api_url = server.url
+
+    routes = [r for r in ROUTES if not args.route or r[0] in args.route]
+
+    print('{:<12} {:>9} {:>9} {:>9} {:>6} {:>6} {:>6} {:>6} {:>6} {:>8}'.format('route', 'import ms', 'cold ms',
+        'warm ms', 'c http', 'w http', 'c sql', 'w sql', 'items', 'peak MB'))
+
+    summaries = []
+    try:
+        for name, url in routes:
+            results = [run_child(url, args.api_url, args.warm, args.token) for i in range(args.runs)]
+            row = summarise(name, results)
+            summaries.append(row)
+
+            print('{route:<12} {import_ms:>9.1f} {cold_ms:>9.1f} {warm_ms:>9.1f} {cold_http:>6g} {warm_http:>6g} '
+                '{cold_sql:>6g} {warm_sql:>6g} {items:>6g} {peak_mb:>8.1f}'.format(**row))
+    finally:
+        if server:
+            server.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summaries, f, indent=4)
+
+if __name__ == '__main__':
+    main()
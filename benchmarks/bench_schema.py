@@ -0,0 +1,82 @@
+# First-connection cost of schema verification (database.check_tables) in a fresh interpreter.
+#   python2 benchmarks/bench_schema.py [--runs 10]
+#
+# create: empty profile, every table is created
+# verify: tables exist but there is no marker, so every table's CREATE SQL is rendered, hashed and looked up
+# marker: the marker for this addon version vouches for every table, so only the marker file is read
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.bench_routes import median
+
+def child():
+    sys.path.insert(0, STUBS_DIR)
+
+    # every module that registers a table
+    from resources.lib import models
+    from resources.lib.matthuisman import database, cache, stats, singleflight
+
+    start = time.time()
+    database.db.connect()
+    elapsed = time.time() - start
+
+    database.close()
+    print(json.dumps({'connect': elapsed, 'tables': len(database.tables)}))
+
+def run_child(root):
+    env    = dict(os.environ, BENCH_KODI_ROOT=root)
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child'], env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def _marker(root):
+    for dir_path, dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name.endswith('.db.schema'):
+                return os.path.join(dir_path, file_name)
+
+def main():
+    parser = argparse.ArgumentParser(description='Schema verification benchmarks')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per case')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child()
+
+    results = {'create': [], 'verify': [], 'marker': []}
+    tables  = 0
+
+    for i in range(args.runs):
+        root = tempfile.mkdtemp(prefix='kodi-bench-')
+        try:
+            result = run_child(root)
+            results['create'].append(result['connect'])
+            tables = result['tables']
+
+            results['marker'].append(run_child(root)['connect'])
+
+            os.remove(_marker(root))
+            results['verify'].append(run_child(root)['connect'])
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print('{:<10} {:>12}  ({} tables)'.format('case', 'connect ms', tables))
+    for name in ('create', 'verify', 'marker'):
+        print('{:<10} {:>12.2f}'.format(name, median(results[name]) * 1000))
+
+if __name__ == '__main__':
+    main()
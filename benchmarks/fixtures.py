@@ -0,0 +1,148 @@
+# Synthetic CuriosityStream API payloads shaped like the real responses.
+# Values are derived from the ids so every run serves identical bytes.
+
+LOREM = ('From the depths of the ocean to the edge of the universe, this documentary follows the scientists '
+         'and explorers who are pushing the boundaries of what we know about our world. ')
+
+def _image(kind, id):
+    return 'https://image.curiositystream.com/{}/{}.jpg'.format(kind, id)
+
+CDN_URL = 'https://cdn.curiositystream.com'
+
+def media(id, captions=4, cdn_url=CDN_URL, padding=0):
+    row = {
+        'id': id,
+        'type': 'media',
+        'title': 'Documentary {}'.format(id),
+        'description': LOREM * 3,
+        'short_description': LOREM,
+        'duration': 1200 + (id * 37) % 2400,
+        'year_produced': 1990 + id % 30,
+        'rating_percentage': 50 + id % 50,
+        'producer': 'CuriosityStream',
+        'director': 'Director {}'.format(id),
+        'cast': ['Presenter {}'.format(x) for x in range(3)],
+        'tags': ['science', 'space', 'nature', 'history'],
+        'categories': ['science', 'space'],
+        'image_small': _image('small', id),
+        'image_medium': _image('medium', id),
+        'image_large': _image('large', id),
+        'image_keyframe': _image('keyframe', id),
+        'image_promo': _image('promo', id),
+        'cover_image_url': _image('cover', id),
+        'background_url': _image('background', id),
+        'is_free': id % 7 == 0,
+        'is_published': True,
+        'is_collection': False,
+        'is_numbered_series': False,
+        'is_child_friendly': id % 3 == 0,
+        'is_new': False,
+        'is_featured': id % 5 == 0,
+        'published_at': '2019-07-01T00:00:00.000Z',
+        'user_media': {
+            'media_id': id,
+            'is_bookmarked': id % 4 == 0,
+            'progress_in_seconds': 0,
+            'rating': None,
+            'updated_at': '2019-07-01T00:00:00.000Z',
+        },
+        'closed_captions': [{
+            'id': id * 10 + x,
+            'code': code,
+            'language': code,
+            'file': '{}/captions/{}/{}.vtt'.format(cdn_url, id, code),
+        } for x, code in enumerate(['en', 'es', 'fr', 'de', 'pt', 'it'][:captions])],
+        'encodings': [{
+            'type': 'hls',
+            'master_playlist_url': 'https://cdn.curiositystream.com/media/{}/master.m3u8'.format(id),
+            'file_url': 'https://cdn.curiositystream.com/media/{}/1080.mp4'.format(id),
+        }],
+        'preview': {'file_url': 'https://cdn.curiositystream.com/media/{}/preview.mp4'.format(id)},
+    }
+
+    if padding:
+        row['padding'] = 'x' * padding
+
+    return row
+
+def category(id, subcategories=0):
+    return {
+        'id': id,
+        'name': 'category-{}'.format(id),
+        'label': 'Category {}'.format(id),
+        'description': LOREM,
+        'image_url': _image('category', id),
+        'background_url': _image('background', id),
+        'header_url': _image('header', id),
+        'color': '#f3a000',
+        'is_active': True,
+        'order': id,
+        'subcategories': [category(id * 100 + x) for x in range(subcategories)],
+    }
+
+def collection(id, media_count=0, **kwargs):
+    return {
+        'id': id,
+        'title': 'Collection {}'.format(id),
+        'description': LOREM * 2,
+        'image_url': _image('collection', id),
+        'background_url': _image('background', id),
+        'image_large': _image('large', id),
+        'is_collection': True,
+        'is_numbered_series': id % 2 == 0,
+        'media_count': media_count,
+        'media': [media(id * 1000 + x, **kwargs) for x in range(media_count)],
+    }
+
+def paginated(rows, page=1, total_pages=10):
+    return {
+        'data': rows,
+        'paginator': {
+            'current_page': page,
+            'total_pages': total_pages,
+            'per_page': len(rows),
+            'total': len(rows) * total_pages,
+        },
+    }
+
+def categories(count=12, subcategories=8):
+    return {'data': [category(x+1, subcategories) for x in range(count)]}
+
+def featured(count=20, **kwargs):
+    return {'data': [media(x+1, **kwargs) for x in range(count)]}
+
+def sections(count=8, media_count=12, **kwargs):
+    types = ['custom', 'playlist', 'category']
+
+    return {'data': {'groups': [{
+        'id': x + 1,
+        'type': types[x % len(types)],
+        'label': 'Section {}'.format(x + 1),
+        'name': 'category-{}'.format(x + 1),
+        'model_id': x + 1,
+        'description': LOREM,
+        'image_url': _image('section', x + 1),
+        'background_url': _image('background', x + 1),
+        'media': [media((x + 1) * 100 + y, **kwargs) for y in range(media_count)],
+    } for x in range(count)]}}
+
+def collections(count=20, page=1, total_pages=10):
+    return paginated([collection((page-1) * count + x + 1) for x in range(count)], page=page, total_pages=total_pages)
+
+def filter_media(count=20, page=1, total_pages=10, **kwargs):
+    return paginated([media((page-1) * count + x + 1, **kwargs) for x in range(count)], page=page, total_pages=total_pages)
+
+def series(id, count=10, **kwargs):
+    return {'data': collection(id, media_count=count, **kwargs)}
+
+def captions(id, code, cues=400):
+    lines = ['WEBVTT', '']
+
+    for x in range(cues):
+        start = x * 3
+        lines.append('{:02d}:{:02d}:{:02d}.000 --> {:02d}:{:02d}:{:02d}.500'.format(start // 3600, start // 60 % 60, start % 60,
+            (start + 2) // 3600, (start + 2) // 60 % 60, (start + 2) % 60))
+        lines.append('[{}] Caption line {} for media {}'.format(code, x, id))
+        lines.append('')
+
+    return '\n'.join(lines)
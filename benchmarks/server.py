@@ -0,0 +1,268 @@
+# Local stand-in for the CuriosityStream API endpoints used by resources/lib/api.py.
+#   python benchmarks/server.py --port 8765 --latency 80 --jitter 40 --error-rate 0.05
+#
+# Point the addon at it by setting resources.lib.constants.API_URL to 'http://127.0.0.1:8765{}'
+# before resources.lib.api is imported (the benchmark harness does this for you).
+from __future__ import print_function
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qsl
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qsl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks import fixtures
+
+AUTH_TOKEN = 'stand-in-token'
+
+class Config(object):
+    def __init__(self, latency=0, jitter=0, error_rate=0.0, error_mode='status', padding=0,
+            total_pages=10, captions=4, caption_cues=400, fixtures_dir=None, seed=1):
+        self.latency      = latency      # ms added to every response
+        self.jitter       = jitter       # +/- ms of uniform noise on top of latency
+        self.error_rate   = error_rate   # fraction of requests that fail
+        self.error_mode   = error_mode   # status (HTTP 503) or reset (drop the connection)
+        self.padding      = padding      # extra bytes per media row
+        self.total_pages  = total_pages
+        self.captions     = captions     # caption tracks per media
+        self.caption_cues = caption_cues
+        self.fixtures_dir = fixtures_dir # directory of recorded JSON responses that override the generated ones
+        self.random       = random.Random(seed)
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # headers and body go out as separate writes, so with Nagle on every response on a
+    # kept-alive connection waits for the client's delayed ACK (~40ms) and reuse looks slow
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ('POST', r'^/v1/login/?$', 'login'),
+        ('POST', r'^/v1/user_media$', 'user_media'),
+        ('GET', r'^/v1/categories$', 'categories'),
+        ('GET', r'^/v2/featured$', 'featured'),
+        ('GET', r'^/v1/sections/(\d+)/mobile$', 'sections'),
+        ('GET', r'^/v2/collections$', 'collections'),
+        ('GET', r'^/v2/collections/(\d+)$', 'series'),
+        ('GET', r'^/v2/series/(\d+)$', 'series'),
+        ('GET', r'^/v1/media$', 'filter_media'),
+        ('GET', r'^/v1/media/(\d+)$', 'media'),
+        ('GET', r'^/captions/(\d+)/(\w+)\.vtt$', 'captions'),
+        ('GET', r'^/_stats$', 'stats'),
+        ('POST', r'^/_reset$', 'reset'),
+    ]
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_HEAD(self):
+        self._send(200, b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        self._handle('POST')
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _handle(self, method):
+        url    = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.match(pattern, url.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send_json({'error': 'not found'}, 404)
+
+        if not name.startswith('_') and name not in ('stats', 'reset'):
+            self.server.record(name)
+
+            delay = self.config.latency + self.config.random.uniform(-self.config.jitter, self.config.jitter)
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+
+            if self.config.error_rate and self.config.random.random() < self.config.error_rate:
+                self.server.record('errors')
+                if self.config.error_mode == 'reset':
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+
+                return self._send_json({'error': 'injected'}, 503)
+
+        getattr(self, 'route_' + name)(params, *match.groups())
+
+    def _recorded(self, name):
+        if not self.config.fixtures_dir:
+            return None
+
+        path = os.path.join(self.config.fixtures_dir, name + '.json')
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as f:
+            return json.load(f)
+
+    def _send(self, status, body, content_type='application/json', etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record_bytes(len(body))
+
+    def _send_json(self, data, status=200, content_type='application/json'):
+        body = data if isinstance(data, bytes) else json.dumps(data).encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.server.record('not_modified')
+            return self._send(304, b'', content_type, etag)
+
+        self._send(status, body, content_type, etag)
+
+    def _media_kwargs(self):
+        return {'captions': self.config.captions, 'padding': self.config.padding, 'cdn_url': self.server.url}
+
+    def route_login(self, params):
+        if b'password=bad' in self.body:
+            return self._send_json({'error': {'message': {'base': ['Invalid email or password']}}})
+
+        self._send_json({'message': {'auth_token': AUTH_TOKEN}})
+
+    def route_user_media(self, params):
+        self._send_json({'message': 'ok', 'data': {'media_id': params.get('media_id')}})
+
+    def route_categories(self, params):
+        self._send_json(self._recorded('categories') or fixtures.categories())
+
+    def route_featured(self, params):
+        self._send_json(self._recorded('featured') or fixtures.featured(**self._media_kwargs()))
+
+    def route_sections(self, params, id):
+        self._send_json(self._recorded('sections') or fixtures.sections(**self._media_kwargs()))
+
+    def route_collections(self, params):
+        page  = int(params.get('page', 1))
+        limit = int(params.get('limit', 20))
+        self._send_json(self._recorded('collections') or fixtures.collections(limit, page, self.config.total_pages))
+
+    def route_series(self, params, id):
+        self._send_json(self._recorded('series') or fixtures.series(int(id), **self._media_kwargs()))
+
+    def route_filter_media(self, params):
+        page  = int(params.get('page', 1))
+        limit = int(params.get('limit', 20))
+        self._send_json(self._recorded('media') or fixtures.filter_media(limit, page, self.config.total_pages, **self._media_kwargs()))
+
+    def route_media(self, params, id):
+        self._send_json(self._recorded('media_{}'.format(id)) or {'data': fixtures.media(int(id), **self._media_kwargs())})
+
+    def route_captions(self, params, id, code):
+        body = fixtures.captions(id, code, self.config.caption_cues).encode('utf-8')
+        self._send_json(body, content_type='text/vtt')
+
+    def route_stats(self, params):
+        self._send(200, json.dumps(self.server.stats).encode('utf-8'))
+
+    def route_reset(self, params):
+        self.server.reset()
+        self._send(200, b'{}')
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, config=None):
+        HTTPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.config = config or Config()
+        self._lock  = threading.Lock()
+        self._thread = None
+        self.reset()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    @property
+    def api_url(self):
+        return self.url + '{}'
+
+    def record(self, name):
+        with self._lock:
+            self.stats['requests'][name] = self.stats['requests'].get(name, 0) + 1
+
+    def record_bytes(self, size):
+        with self._lock:
+            self.stats['bytes'] += size
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'requests': {}, 'bytes': 0}
+
+    def total_requests(self):
+        with self._lock:
+            return sum(v for k, v in self.stats['requests'].items() if k not in ('errors', 'not_modified'))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='CuriosityStream API stand-in')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0, help='ms added to each response')
+    parser.add_argument('--jitter', type=float, default=0, help='+/- ms of noise on the latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests that fail')
+    parser.add_argument('--error-mode', choices=['status', 'reset'], default='status')
+    parser.add_argument('--padding', type=int, default=0, help='extra bytes per media row')
+    parser.add_argument('--total-pages', type=int, default=10)
+    parser.add_argument('--captions', type=int, default=4, help='caption tracks per media')
+    parser.add_argument('--caption-cues', type=int, default=400)
+    parser.add_argument('--fixtures', help='directory of recorded JSON responses (categories.json, media.json, ...)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    config = Config(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_mode=args.error_mode,
+        padding=args.padding, total_pages=args.total_pages, captions=args.captions, caption_cues=args.caption_cues,
+        fixtures_dir=args.fixtures, seed=args.seed)
+
+    server = StandInServer(args.port, config)
+    print('CuriosityStream stand-in listening on {}'.format(server.url))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Minimal stand-in for Kodi's xbmc module, enough to import and dispatch the plugin outside Kodi.
+# special:// paths resolve under $BENCH_KODI_ROOT.
+import os
+import sys
+
+LOGDEBUG, LOGINFO, LOGNOTICE, LOGWARNING, LOGERROR, LOGSEVERE, LOGFATAL, LOGNONE = range(8)
+
+ROOT     = os.environ.get('BENCH_KODI_ROOT', os.path.join(os.path.expanduser('~'), '.kodi-bench'))
+LOG      = os.environ.get('BENCH_KODI_LOG')
+builtins = []
+
+def translatePath(path):
+    if not path.startswith('special://'):
+        return path
+
+    path = os.path.join(ROOT, path[len('special://'):])
+
+    dir_path = os.path.dirname(path)
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+
+    return path
+
+def log(msg, level=LOGDEBUG):
+    if LOG:
+        sys.stderr.write('{}\n'.format(msg))
+
+def executebuiltin(function, wait=False):
+    builtins.append(function)
+
+def executeJSONRPC(jsonrpccommand):
+    return '{}'
+
+def getInfoLabel(infotag):
+    return '18.0'
+
+def getCondVisibility(condition):
+    return False
+
+def sleep(time):
+    pass
+
+class Monitor(object):
+    def abortRequested(self):
+        return True
+
+    def waitForAbort(self, timeout=0):
+        return True
+
+class Player(object):
+    def play(self, *args, **kwargs):
+        pass
+
+    def isPlaying(self):
+        return False
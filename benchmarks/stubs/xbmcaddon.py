@@ -0,0 +1,48 @@
+# Addon settings start from the defaults in resources/settings.xml, like a fresh Kodi profile.
+import os
+import xml.etree.ElementTree as ET
+
+ADDON_ID   = 'plugin.video.curiositystream'
+ADDON_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+def _defaults():
+    settings = {}
+    tree = ET.parse(os.path.join(ADDON_PATH, 'resources', 'settings.xml'))
+    for elem in tree.iter('setting'):
+        if elem.get('id'):
+            settings[elem.get('id')] = elem.get('default', '')
+    return settings
+
+def _version():
+    return ET.parse(os.path.join(ADDON_PATH, 'addon.xml')).getroot().get('version')
+
+settings = _defaults()
+
+class Addon(object):
+    def __init__(self, id=''):
+        # Kodi falls back to the running addon when no id is given
+        id = id or ADDON_ID
+        self._info = {
+            'id':      id,
+            'name':    'CuriosityStream',
+            'version': _version(),
+            'path':    ADDON_PATH,
+            'profile': 'special://profile/addon_data/{}/'.format(id),
+            'icon':    os.path.join(ADDON_PATH, 'icon.png'),
+            'fanart':  os.path.join(ADDON_PATH, 'fanart.jpg'),
+        }
+
+    def getAddonInfo(self, id):
+        return self._info.get(id, '')
+
+    def getSetting(self, id):
+        return settings.get(id, '')
+
+    def setSetting(self, id, value):
+        settings[id] = value
+
+    def getLocalizedString(self, id):
+        return str(id)
+
+    def openSettings(self):
+        pass
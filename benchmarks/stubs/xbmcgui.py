@@ -0,0 +1,51 @@
+# Window properties live in a module dict, so they last for the life of the process like Kodi's home window.
+ALPHANUM_HIDE_INPUT = 1
+
+properties = {}
+
+class Window(object):
+    def __init__(self, existingWindowId=-1):
+        pass
+
+    def getProperty(self, key):
+        return properties.get(key, '')
+
+    def setProperty(self, key, value):
+        properties[key] = value
+
+    def clearProperty(self, key):
+        properties.pop(key, None)
+
+class ListItem(object):
+    def __init__(self, label='', label2='', iconImage='', thumbnailImage='', path='', offscreen=False):
+        self.label      = label
+        self.path       = path
+        self.properties = {}
+        self.subtitles  = []
+
+    def setLabel(self, label):
+        self.label = label
+
+    def setPath(self, path):
+        self.path = path
+
+    def getPath(self):
+        return self.path
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def setSubtitles(self, subtitleFiles):
+        self.subtitles = subtitleFiles
+
+    def __getattr__(self, name):
+        # setInfo, setArt, addStreamInfo, addContextMenuItems, setMimeType, ...
+        return lambda *args, **kwargs: None
+
+class Dialog(object):
+    def __getattr__(self, name):
+        # input/ok/yesno/select/notification: answer as if the user cancelled
+        return lambda *args, **kwargs: ''
+
+class DialogProgress(Dialog):
+    pass
@@ -0,0 +1,24 @@
+# Records what the plugin hands back to Kodi so a dispatch can be inspected.
+SORT_METHOD_UNSORTED, SORT_METHOD_LABEL, SORT_METHOD_DATEADDED = range(3)
+
+items    = []
+resolved = []
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    items.append((url, listitem, isFolder))
+    return True
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    pass
+
+def setResolvedUrl(handle, succeeded, listitem):
+    resolved.append(listitem)
+
+def setContent(handle, content):
+    pass
+
+def setPluginCategory(handle, category):
+    pass
+
+def addSortMethod(handle, sortMethod, label2Mask=''):
+    pass
@@ -1,36 +1,74 @@
 import hashlib
 import os
 import codecs
-
-import xbmc
+import time
 
 from matthuisman import userdata, settings
-from matthuisman.session import Session
 from matthuisman.exceptions import Error
 from matthuisman.log import log
-from matthuisman import mem_cache
-
-from pycaption import detect_format, SRTWriter
+from matthuisman.util import thread_map, remove_file
+from matthuisman.constants import ADDON_PROFILE
+from matthuisman import mem_cache, prefetch
 
-from .constants import HEADERS, API_URL, CACHE_TIME
+from .constants import HEADERS, API_URL, CACHE_TIME, CACHE_STALE_TIME, CACHE_BUDGET, CACHE_L2_TIME, PAGE_SIZE, SUBTITLE_THREADS, SUBTITLE_TIMEOUT, SUBTITLE_DIR, SUBTITLE_CACHE_AGE, SUBTITLE_CACHE_SIZE
 from .language import _
+from . import projection
 
 class APIError(Error):
     pass
 
+USER_LIST_TAGS = {'bookmarked': 'user:watchlist', 'watching': 'user:watching'}
+
+def _media_tags(data, api, filterby, *args, **kwargs):
+    tags = ['media:{}'.format(row['id']) for row in data.get('data', [])]
+    if filterby in USER_LIST_TAGS:
+        tags.append(USER_LIST_TAGS[filterby])
+
+    return tags
+
 class API(object):
+    def __init__(self):
+        self._http = None
+
+    @property
+    def _session(self):
+        #requests is only imported by routes that actually call the API
+        if not self._http:
+            from matthuisman.session import Session
+            self._http = Session(HEADERS, base_url=API_URL)
+            self._set_authentication()
+
+        return self._http
+
     def new_session(self):
-        self.logged_in = False
-        self._session  = Session(HEADERS, base_url=API_URL)
+        #keep the session (and its connection pool) for the life of the interpreter
+        if self._http:
+            self._http.reload_settings()
+
         self._set_authentication()
-        
+
     def _set_authentication(self):
         access_token = userdata.get('token')
-        if not access_token:
+        self.logged_in = bool(access_token)
+
+        if not self._http:
             return
 
-        self._session.headers.update({'X-Auth-Token': access_token})
-        self.logged_in = True
+        if not access_token:
+            self._http.headers.pop('X-Auth-Token', None)
+        elif self._http.headers.get('X-Auth-Token') != access_token:
+            self._http.headers['X-Auth-Token'] = access_token
+
+    def preconnect(self):
+        #a fresh interpreter opens its connection on the first API call
+        if self._http:
+            self._http.preconnect('/')
+
+    def pool_stats(self):
+        if not self._http:
+            return 0, 0
+
+        return self._http.pool_stats()
 
     def login(self, username, password):
         self.logout()
@@ -53,16 +91,16 @@ class API(object):
         userdata.set('token', data['message']['auth_token'])
         self._set_authentication()
 
-    @mem_cache.cached(CACHE_TIME)
+    @mem_cache.cached(CACHE_TIME, stale=CACHE_STALE_TIME, budget=CACHE_BUDGET, l2=CACHE_L2_TIME)
     def categories(self):
-        return self._session.get('/v1/categories').json()['data']
+        return projection.categories(self._session.get('/v1/categories', revalidate=True).json()['data'])
 
     def series(self, id):
         return self._session.get('/v2/series/{}'.format(id)).json()['data']
 
-    @mem_cache.cached(CACHE_TIME)
+    @mem_cache.cached(CACHE_TIME, stale=CACHE_STALE_TIME, budget=CACHE_BUDGET, l2=CACHE_L2_TIME)
     def featured(self):
-        return self._session.get('/v2/featured').json()
+        return projection.featured(self._session.get('/v2/featured', revalidate=True).json())
 
     def sections(self, id, page=1):
         params = {
@@ -81,22 +119,29 @@ class API(object):
 
         return self._session.get('/v2/collections/{}'.format(id), params=params).json()['data']
 
-    @mem_cache.cached(CACHE_TIME)
+    @prefetch.prefetchable
+    @mem_cache.cached(CACHE_TIME, stale=CACHE_STALE_TIME, budget=CACHE_BUDGET, l2=CACHE_L2_TIME)
     def collections(self, flattened=False, excludeMedia=True, page=1):
         params = {
             'flattened': flattened,
             'excludeMedia': excludeMedia,
-            'limit': 20,
+            'limit': PAGE_SIZE,
             'page': page,
         }
 
-        return self._session.get('/v2/collections', params=params).json()
+        return projection.paginated(self._session.get('/v2/collections', params=params, revalidate=True).json(), projection.collection)
 
+    @prefetch.prefetchable
+    @mem_cache.cached(CACHE_TIME, stale=CACHE_STALE_TIME, budget=CACHE_BUDGET, tags=_media_tags)
     def filter_media(self, filterby, term=None, collections=True, page=1):
+        return self.filter_media_uncached(filterby, term, collections, page)
+
+    #for background crawls, so they don't fill the caches meant for browsing
+    def filter_media_uncached(self, filterby, term=None, collections=True, page=1):
         params = {
             'filterBy': filterby,
             'collections': collections,
-            'limit': 20,
+            'limit': PAGE_SIZE,
             'page': page,
         }
 
@@ -113,28 +158,72 @@ class API(object):
 
         params.update(kwargs)
 
-        data = self._session.post('/v1/user_media', params=params, json={}).json()
-        print(data)
+        self._session.post('/v1/user_media', params=params, json={})
+
+        tags = ['media:{}'.format(id)]
+        if 'is_bookmarked' in kwargs:
+            tags.append(USER_LIST_TAGS['bookmarked'])
+
+        mem_cache.invalidate(*tags)
+
+    def clear_watching(self):
+        mem_cache.invalidate(USER_LIST_TAGS['watching'])
 
     def get_subtitles(self, captions):
-        subtitles = []
+        from matthuisman import cache, keys
+
+        subtitles = [None] * len(captions)
+        missing   = []
+
+        path = os.path.join(ADDON_PROFILE, SUBTITLE_DIR)
+        if not os.path.exists(path):
+            os.makedirs(path)
 
         for idx, caption in enumerate(captions):
-            try:
-                r      = self._session.get(caption['file'])
-                reader = detect_format(r.text)
-                srt    = SRTWriter().write(reader().read(r.text))
-            except:
-                log.debug('Failed to parse subtitle: {}'.format(caption['file']))
+            srtfile = _subtitle_path(cache.get(keys.build('subtitle', caption['file'])), caption['code'])
+            if srtfile and os.path.exists(srtfile):
+                log.debug('Subtitle Cache Hit: {}'.format(caption['file']))
+                os.utime(srtfile, None)
+                subtitles[idx] = srtfile
             else:
-                srtfile = xbmc.translatePath('special://temp/curiosity{}.{}.srt'.format(idx, caption['code'])).decode('utf-8')
+                missing.append(idx)
+
+        if missing:
+            from pycaption import detect_format, SRTWriter
+
+        def convert(idx):
+            caption = captions[idx]
+            r       = self._session.get(caption['file'])
+            digest  = hashlib.md5(r.content).hexdigest()
+
+            if os.path.exists(_subtitle_path(digest, caption['code'])):
+                return digest, None
+
+            reader = detect_format(r.text)
+            return digest, SRTWriter().write(reader().read(r.text))
+
+        results = thread_map(convert, missing, workers=SUBTITLE_THREADS, timeout=SUBTITLE_TIMEOUT)
+
+        for idx, result in zip(missing, results):
+            caption = captions[idx]
+            if result is None:
+                log.debug('Failed to parse subtitle: {}'.format(caption['file']))
+                continue
 
+            digest, srt = result
+            srtfile = _subtitle_path(digest, caption['code'])
+
+            if srt is not None:
                 with codecs.open(srtfile, "w", "utf-8") as f:
                     f.write(srt)
 
-                subtitles.append(srtfile)
+            cache.set(keys.build('subtitle', caption['file']), digest, expires=SUBTITLE_CACHE_AGE)
+            subtitles[idx] = srtfile
+
+        if missing:
+            _evict_subtitles()
 
-        return subtitles
+        return [x for x in subtitles if x]
 
     def media(self, id):
         # params = {
@@ -147,4 +236,38 @@ class API(object):
     def logout(self):
         userdata.delete('token')
         mem_cache.empty()
-        self.new_session()
\ No newline at end of file
+
+        #nothing from the logged in session (cookies, connections) carries over
+        if self._http:
+            self._http.close()
+            self._http = None
+
+        self.new_session()
+
+def _subtitle_path(digest, code):
+    if not digest:
+        return None
+
+    return os.path.join(ADDON_PROFILE, SUBTITLE_DIR, u'{}.{}.srt'.format(digest, code))
+
+def _evict_subtitles():
+    path  = os.path.join(ADDON_PROFILE, SUBTITLE_DIR)
+    now   = time.time()
+    files = []
+
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        stat = os.stat(file_path)
+
+        if now - stat.st_mtime > SUBTITLE_CACHE_AGE:
+            remove_file(file_path)
+        else:
+            files.append((stat.st_mtime, stat.st_size, file_path))
+
+    total = sum(x[1] for x in files)
+    for mtime, size, file_path in sorted(files):
+        if total <= SUBTITLE_CACHE_SIZE:
+            break
+
+        remove_file(file_path)
+        total -= size
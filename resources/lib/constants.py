@@ -7,5 +7,20 @@ HEADERS = {
 
 API_URL = 'https://api.curiositystream.com{}'
 
-PREVIEW_LENGTH = (2*60)
-CACHE_TIME     = 60*2
\ No newline at end of file
+PREVIEW_LENGTH   = (2*60)
+CACHE_TIME       = 60*2
+CACHE_STALE_TIME = (60*60) # Serve up to 1 hour past expiry while refreshing
+CACHE_BUDGET     = 0.5 # Seconds a refresh may take before stale data is served instead
+CACHE_L2_TIME    = (60*60*6) # Catalog kept in the sqlite cache, so Kodi restarts don't refetch it
+PAGE_SIZE        = 20
+FEATURED_ID      = 7
+
+SUBTITLE_THREADS = 4
+SUBTITLE_TIMEOUT = 8
+
+SUBTITLE_DIR        = 'subtitles'
+SUBTITLE_CACHE_AGE  = (60*60*24*30) # 30 Days
+SUBTITLE_CACHE_SIZE = (1024*1024*20) # 20MB
+
+MIRROR_SYNC_INTERVAL = (60*60*12) # 12 Hours
+MIRROR_SYNC_BUDGET   = 30 # Seconds per service run
\ No newline at end of file
@@ -19,5 +19,7 @@ class Language(BaseLanguage):
     REMOVE_WATCHLIST     = 30016
     WATCHLIST_ADDED      = 30017
     WATCHLIST_REMOVED    = 30018
+    PRECONNECT           = 30019
+    USE_MIRROR           = 30020
 
 _ = Language()
\ No newline at end of file
@@ -1,23 +1,103 @@
+import sqlite3
+import threading
 from time import time
 from functools import wraps
+from collections import namedtuple
 
-from . import peewee, database, settings, signals, gui, router
-from .constants import CACHE_TABLENAME, CACHE_EXPIRY, CACHE_CHECKSUM, CACHE_CLEAN_INTERVAL, CACHE_CLEAN_KEY, ROUTE_CLEAR_CACHE
-from .util import hash_6
+from . import peewee, database, settings, signals, singleflight, keys, codec
+from .constants import CACHE_TABLENAME, CACHE_EXPIRY, CACHE_CHECKSUM, CACHE_CLEAN_INTERVAL, CACHE_CLEAN_KEY, CACHE_CLEAN_BATCH, CACHE_REFRESH_WAIT, CACHE_BACKEND
 from .log import log
-from .language import _
 
-funcs   = []
+funcs       = []
+_refreshing = {}
+
+# sets and deletes made during a dispatch wait here (key => Row, None = delete) and are written in one
+# transaction once the listing is with Kodi. After that, writes (eg. from prefetch threads) go straight through.
+_buffer      = {}
+_buffer_lock = threading.Lock()
+_buffering   = True
+
+Row = namedtuple('Row', 'value expires stale_until cost tags')
+
+def _split(tags):
+    return tuple(tag for tag in tags.split('|') if tag)
 
 class Cache(database.Model):
     checksum = CACHE_CHECKSUM
 
-    key     = database.HashField(unique=True)
-    value   = database.PickledField()
-    expires = peewee.IntegerField()
+    key         = peewee.TextField(primary_key=True)
+    value       = database.PickledField()
+    expires     = peewee.IntegerField()
+    stale_until = peewee.IntegerField(index=True)
+    cost        = peewee.FloatField(default=0)
+    tags        = peewee.TextField(default='')
 
     class Meta:
-        table_name = CACHE_TABLENAME
+        table_name    = CACHE_TABLENAME
+        without_rowid = True
+
+class PeeweeBackend(object):
+    def get(self, key, now):
+        try:
+            row = Cache.get(Cache.key == key, Cache.stale_until > now)
+        except Cache.DoesNotExist:
+            return None
+
+        return Row(row.value, row.expires, row.stale_until, row.cost, _split(row.tags))
+
+    def set(self, key, value, expires, stale_until, cost, tags):
+        Cache.set(key=key, value=value, expires=expires, stale_until=stale_until, cost=cost, tags=tags)
+
+    def delete(self, key):
+        return Cache.delete_where(Cache.key == key)
+
+    def invalidate(self, tag):
+        return Cache.delete_where(peewee.fn.instr(Cache.tags, tag) > 0)
+
+    def truncate(self):
+        return Cache.truncate()
+
+    def delete_expired(self, now, limit):
+        expired = Cache.select(Cache.key).where(Cache.stale_until < now).limit(limit)
+        return Cache.delete_where(Cache.key.in_(expired))
+
+class SqliteBackend(object):
+    # Same table as the Cache model, straight through sqlite3.
+    # The SQL never changes, so sqlite3's per-connection statement cache keeps them prepared.
+    GET            = 'SELECT value, expires, stale_until, cost, tags FROM "{}" WHERE key = ? AND stale_until > ?'.format(CACHE_TABLENAME)
+    SET            = 'REPLACE INTO "{}" (key, value, expires, stale_until, cost, tags) VALUES (?, ?, ?, ?, ?, ?)'.format(CACHE_TABLENAME)
+    DELETE         = 'DELETE FROM "{}" WHERE key = ?'.format(CACHE_TABLENAME)
+    INVALIDATE     = 'DELETE FROM "{}" WHERE instr(tags, ?) > 0'.format(CACHE_TABLENAME)
+    TRUNCATE       = 'DELETE FROM "{}"'.format(CACHE_TABLENAME)
+    DELETE_EXPIRED = 'DELETE FROM "{0}" WHERE key IN (SELECT key FROM "{0}" WHERE stale_until < ? LIMIT ?)'.format(CACHE_TABLENAME)
+
+    def _execute(self, sql, params=()):
+        #peewee's connection for this thread, so check_tables and atomic() still apply
+        return database.db.connection().execute(sql, params)
+
+    def get(self, key, now):
+        row = self._execute(self.GET, (key, now)).fetchone()
+        if not row:
+            return None
+
+        return Row(codec.decode(str(row[0])), row[1], row[2], row[3], _split(row[4]))
+
+    def set(self, key, value, expires, stale_until, cost, tags):
+        self._execute(self.SET, (key, sqlite3.Binary(codec.encode(value)), expires, stale_until, cost, tags))
+
+    def delete(self, key):
+        return self._execute(self.DELETE, (key,)).rowcount
+
+    def invalidate(self, tag):
+        return self._execute(self.INVALIDATE, (tag,)).rowcount
+
+    def truncate(self):
+        return self._execute(self.TRUNCATE).rowcount
+
+    def delete_expired(self, now, limit):
+        return self._execute(self.DELETE_EXPIRED, (now, limit)).rowcount
+
+backend = SqliteBackend() if CACHE_BACKEND == 'sqlite' else PeeweeBackend()
 
 def enabled():
     return settings.getBool('use_cache', True)
@@ -27,79 +107,184 @@ def key_for(f, *args, **kwargs):
     if not enabled() or func_name not in funcs:
         return None
 
-    return _build_key(func_name, *args, **kwargs)
-
-def _build_key(func_name, *args, **kwargs):
-    key = func_name
-
-    def to_str(item):
-        try:
-            return item.encode('utf-8')
-        except:
-            return str(item)
-    
-    for k in sorted(args):
-        key += to_str(k)
-
-    for k in sorted(kwargs):
-        key += to_str(k) + to_str(kwargs[k])
-
-    return hash_6(key)
+    return keys.build(f, *args, **kwargs)
 
+# tags = list of tags, or a function called with (value, *args, **kwargs) that returns them
 def cached(*args, **kwargs):
-    def decorator(f, expires=CACHE_EXPIRY, key=None):
+    def decorator(f, expires=CACHE_EXPIRY, key=None, stale=0, budget=None, tags=None):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            _key = key or _build_key(f.__name__, *args, **kwargs)
+            skip_cache = kwargs.pop('_skip_cache', False)
+            _budget    = kwargs.pop('_budget', budget)
+
+            _key = key or keys.build(f, *args, **kwargs)
             if callable(_key):
                 _key = _key(*args, **kwargs)
 
-            if not kwargs.pop('_skip_cache', False):
-                value = get(_key)
-                if value != None:
+            if not skip_cache:
+                row = get_stale(_key)
+                if row and row.expires > time():
                     log('Cache Hit: {}'.format(_key))
-                    return value
+                    return row.value
 
-            value = f(*args, **kwargs)
-            if value != None:
-                set(_key, value, expires)
+                # serve stale when within max staleness and a fetch would blow the latency budget
+                if stale and row and (_budget is None or row.cost > _budget):
+                    log('Cache Stale: {}'.format(_key))
+                    _refresh(_key, f, args, kwargs, expires, stale, tags)
+                    return row.value
 
-            return value
+            return _fetch(_key, f, args, kwargs, expires, stale, tags, lookup=not skip_cache)
 
         funcs.append(f.__name__)
         return decorated_function
 
     return lambda f: decorator(f, *args, **kwargs)
 
+def _fetch(key, f, args, kwargs, expires, stale, tags=None, lookup=False):
+    def store(value, cost):
+        set(key, value, expires, stale, cost=cost, tags=tags(value, *args, **kwargs) if callable(tags) else tags)
+
+    def fetch():
+        start = time()
+        value = f(*args, **kwargs)
+        if value != None:
+            store(value, time() - start)
+
+        return value
+
+    # only one thread or process fetches a key at a time, the ones waiting on it get its result
+    return singleflight.do('cache.' + key, fetch, lookup=(lambda: get(key)) if lookup else None, store=store)
+
+def _refresh(key, f, args, kwargs, expires, stale, tags=None):
+    thread = _refreshing.get(key)
+    if thread and thread.is_alive():
+        return
+
+    def refresh():
+        try:
+            with database.db.connection_context():
+                _fetch(key, f, args, kwargs, expires, stale, tags)
+        except Exception as e:
+            log.debug('Cache Refresh Failed: {} ({})'.format(key, e))
+
+    thread = _refreshing[key] = threading.Thread(target=refresh)
+    thread.daemon = True
+    thread.start()
+
+@signals.on(signals.AFTER_DISPATCH)
+def wait_refreshes():
+    end = time() + CACHE_REFRESH_WAIT
+    for key in _refreshing.keys():
+        _refreshing.pop(key).join(max(0, end - time()))
+
 def get(key, default=None):
-    if not enabled():
+    row = get_stale(key)
+    if not row or row.expires <= time():
         return default
 
-    try:
-        return Cache.get(Cache.key == key, Cache.expires > time()).value
-    except Cache.DoesNotExist:
-        return default
+    return row.value
 
-def set(key, value, expires=CACHE_EXPIRY):
+def get_stale(key):
+    if not enabled():
+        return None
+
+    with _buffer_lock:
+        if key in _buffer:
+            row = _buffer[key]
+            return row if row and row.stale_until > time() else None
+
+    return backend.get(key, time())
+
+# tags are stored as |tag1|tag2| so a tag can't match part of another one
+def _write(key, row):
+    if row is None:
+        return backend.delete(key)
+
+    backend.set(key, row.value, row.expires, row.stale_until, row.cost, '|{}|'.format('|'.join(row.tags)) if row.tags else '')
+
+def set(key, value, expires=CACHE_EXPIRY, stale=0, cost=0, tags=None):
     expires = int(time() + expires)
-    Cache.set(key=key, value=value, expires=expires)
+    row     = Row(value, expires, expires + stale, cost, tuple(tags or ()))
+
+    with _buffer_lock:
+        if _buffering:
+            _buffer[key] = row
+            return
+
+    _write(key, row)
 
 def delete(key):
-    return Cache.delete_where(Cache.key == key)
+    with _buffer_lock:
+        if _buffering:
+            existed = _buffer[key] is not None if key in _buffer else backend.get(key, 0) is not None
+            _buffer[key] = None
+            return int(existed)
+
+    return backend.delete(key)
+
+def invalidate(*tags):
+    with _buffer_lock:
+        buffered = [key for key in _buffer if _buffer[key] and any(tag in _buffer[key].tags for tag in tags)]
+        for key in buffered:
+            _buffer[key] = None
+
+    deleted = len(buffered) + sum(backend.invalidate('|{}|'.format(tag)) for tag in tags)
+    log('Cache: Invalidated {} Rows ({})'.format(deleted, ', '.join(tags)))
+    return deleted
 
 def empty():
-    deleted = Cache.truncate()
+    with _buffer_lock:
+        _buffer.clear()
+
+    deleted = backend.truncate()
     log('Cache: Deleted {} Rows'.format(deleted))
 
 @signals.on(signals.BEFORE_DISPATCH)
+def start_buffering():
+    global _buffering
+    _buffering = True
+
+# registered after wait_refreshes, so finished refreshes are in this flush.
+# Error and Exit are caught by the router before AFTER_DISPATCH, and the router runs every
+# AFTER_DISPATCH handler even when an earlier one fails, so the buffer always gets here.
+@signals.on(signals.AFTER_DISPATCH)
+def flush():
+    global _buffering
+
+    with _buffer_lock:
+        rows = dict(_buffer)
+        _buffer.clear()
+        _buffering = False
+
+    if not rows:
+        return
+
+    try:
+        with database.db.connection_context():
+            with database.db.atomic():
+                for key in rows:
+                    _write(key, rows[key])
+    except Exception as e:
+        log.error('Failed to write cache: {}'.format(e))
+    else:
+        log('Cache: Wrote {} Rows'.format(len(rows)))
+
+def clean():
+    if time() - settings.getInt(CACHE_CLEAN_KEY, 0) >= CACHE_CLEAN_INTERVAL:
+        remove_expired()
+
 def remove_expired():
-    deleted = Cache.delete_where(Cache.expires < int(time()))
-    log('Cache: Deleted {} Expired Rows'.format(deleted))
+    now     = int(time())
+    deleted = 0
+
+    # small batches keep each write lock short so a dispatch running at the same time isn't held up
+    while True:
+        count = backend.delete_expired(now, CACHE_CLEAN_BATCH)
+        deleted += count
+        if count < CACHE_CLEAN_BATCH:
+            break
 
-@router.route(ROUTE_CLEAR_CACHE)
-def clear_cache(key, **kwargs):
-    delete_count = delete(key)
-    msg = _(_.PLUGIN_CACHE_REMOVED, delete_count=delete_count)
-    gui.notification(msg)
+    settings.setInt(CACHE_CLEAN_KEY, now)
+    log('Cache: Deleted {} Expired Rows'.format(deleted))
 
-database.tables.append(Cache)
\ No newline at end of file
+database.register(Cache)
\ No newline at end of file
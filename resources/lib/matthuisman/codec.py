@@ -0,0 +1,73 @@
+import zlib
+import json
+import marshal
+
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+try:
+    import lz4.block as lz4
+except ImportError:
+    lz4 = None
+
+from .constants import CODEC_COMPRESS_MIN, CODEC_COMPRESS_RATIO, CODEC_ZLIB_LEVEL
+
+# Encoded values start with two characters: the serializer and the compressor (eg. mz = marshal + zlib).
+# Anything else is a plain pickle written before the codec existed.
+SERIALIZERS = {
+    'p': (lambda value: pickle.dumps(value, pickle.HIGHEST_PROTOCOL), pickle.loads),
+    'm': (marshal.dumps, marshal.loads),
+    'j': (lambda value: json.dumps(value, separators=(',', ':')), json.loads),
+}
+
+COMPRESSORS = {
+    '-': (None, None),
+    'z': (lambda data: zlib.compress(data, CODEC_ZLIB_LEVEL), zlib.decompress),
+}
+
+if lz4:
+    COMPRESSORS['l'] = (lz4.compress, lz4.decompress)
+
+def _serialize(value, serializer):
+    if serializer:
+        return serializer, SERIALIZERS[serializer][0](value)
+
+    # marshal is the fastest both ways but only takes builtin types (json loses str/unicode and tuples)
+    try:
+        return 'm', marshal.dumps(value)
+    except ValueError:
+        return 'p', SERIALIZERS['p'][0](value)
+
+def encode(value, serializer=None, compressor=None):
+    serializer, data = _serialize(value, serializer)
+
+    if compressor is None:
+        if len(data) < CODEC_COMPRESS_MIN:
+            return serializer + '-' + data
+
+        compressor = 'l' if lz4 else 'z'
+        compressed = COMPRESSORS[compressor][0](data)
+
+        # not worth inflating on every read when it barely shrinks
+        if len(compressed) > len(data) * CODEC_COMPRESS_RATIO:
+            return serializer + '-' + data
+
+        return serializer + compressor + compressed
+
+    if COMPRESSORS[compressor][0]:
+        data = COMPRESSORS[compressor][0](data)
+
+    return serializer + compressor + data
+
+def decode(data):
+    serializer, compressor = data[:1], data[1:2]
+    if serializer not in SERIALIZERS or compressor not in COMPRESSORS:
+        return pickle.loads(data)
+
+    data = data[2:]
+    if COMPRESSORS[compressor][1]:
+        data = COMPRESSORS[compressor][1](data)
+
+    return SERIALIZERS[serializer][1](data)
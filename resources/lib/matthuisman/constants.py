@@ -26,6 +26,7 @@ DB_PRAGMAS      = {
     'synchronous': 0
 }
 DB_TABLENAME = '_db'
+DB_MARKER    = DB_PATH + '.schema' # Tables already verified for this addon version
 ###################
 
 ##### USERDATA ####
@@ -38,6 +39,12 @@ CACHE_CHECKSUM       = ADDON_VERSION # Recreates cache when new addon version
 CACHE_EXPIRY         = (60*60*24) # 24 Hours
 CACHE_CLEAN_INTERVAL = (60*60*4)  # 4 Hours
 CACHE_CLEAN_KEY      = '_cache_cleaned'
+CACHE_CLEAN_BATCH    = 500 # Expired rows deleted per statement
+CACHE_REFRESH_WAIT   = 10 # Max seconds to wait for stale refreshes after dispatch
+CACHE_BACKEND        = 'sqlite' # sqlite (direct sqlite3) or peewee
+CACHE_MEM_BUDGET     = (1024*1024*4) # 4MB of encoded rows kept in window properties
+CACHE_KEY_VERSION    = 1 # Bump when cached values change shape
+CACHE_KEY_CHECK      = ADDON_DEV # Raise on cache key collisions
 #################
 
 #### ROUTING ####
@@ -48,6 +55,7 @@ ROUTE_IA_SETTINGS      = '_ia_settings'
 ROUTE_IA_INSTALL       = '_ia_install'
 ROUTE_IA_QUALITY       = '_ia_quality'
 ROUTE_CLEAR_CACHE      = '_clear_cache'
+ROUTE_HTTP_STATS       = '_http_stats'
 ROUTE_SERVICE          = '_service'
 ROUTE_SERVICE_INTERVAL = (60*5)
 ROUTE_LIVE_TAG         = '_l'
@@ -78,6 +86,44 @@ LOG_FORMAT = u'%(name)s - %(message)s'
 SESSION_TIMEOUT  = (5, 10)
 SESSION_ATTEMPTS = 2
 SESSION_CHUNKSIZE = 4096
+SESSION_REVALIDATE_EXPIRY = (60*60*24*7) # 7 Days
+SESSION_PRECONNECT_IDLE = 30
+#################
+
+#### HTTP STATS ####
+STATS_TABLENAME     = '_http_stats'
+STATS_WINDOW        = (60*60*24) # 1 Day
+STATS_WINDOWS       = 7 # Days of history kept
+STATS_BUCKETS       = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000) # Histogram bucket upper bounds in ms
+STATS_MAX_ENDPOINTS = 50
+#################
+
+#### SINGLE FLIGHT ####
+SINGLEFLIGHT_TABLENAME = '_lease'
+SINGLEFLIGHT_LEASE     = 30 # Seconds before a crashed fetch's lease is taken over
+SINGLEFLIGHT_WAIT      = 10 # Max seconds to wait on another process's fetch
+SINGLEFLIGHT_POLL      = 0.1
+SINGLEFLIGHT_RESULT    = 10 # Seconds a finished fetch's result waits for the processes that waited on it
+#################
+
+#### PROFILER ####
+PROFILER_TAG       = '_profile'
+PROFILER_SETTING   = '_profile'
+PROFILER_ENV       = 'ADDON_PROFILE_DISPATCH'
+PROFILER_DIR       = 'profiles'
+PROFILER_KEEP      = 10
+PROFILER_LOG_LINES = 25
+PROFILER_MIN_TIME  = 0.00001 # Call paths cheaper than this are left out of the collapsed stacks
+#################
+
+#### CODEC ####
+CODEC_COMPRESS_MIN   = 1024 # Encoded bytes before compression is tried
+CODEC_COMPRESS_RATIO = 0.9 # Keep compressed only when at least 10% smaller
+CODEC_ZLIB_LEVEL     = 1
+#################
+
+#### PREFETCH ####
+PREFETCH_EXPIRY = (60*5)
 #################
 
 #### GUI ####
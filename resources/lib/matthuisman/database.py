@@ -1,19 +1,26 @@
 import os
+import threading
 
-try:
-    import cPickle as pickle
-except:
-    import pickle
-
-from . import peewee, userdata, signals
-from .constants import DB_PATH, DB_PRAGMAS, DB_MAX_INSERTS, DB_TABLENAME, ADDON_DEV
+from . import peewee, userdata, signals, codec
+from .constants import DB_PATH, DB_PRAGMAS, DB_MAX_INSERTS, DB_TABLENAME, DB_MARKER, ADDON_VERSION, ADDON_DEV
 from .util import hash_6
 
 path = os.path.dirname(DB_PATH)
 if not os.path.exists(path):
     os.makedirs(path)
 
-db = peewee.SqliteDatabase(DB_PATH, pragmas=DB_PRAGMAS)
+class Database(peewee.SqliteDatabase):
+    def connect(self, reuse_if_open=False):
+        # a new database file has none of the tables the marker vouches for
+        if not os.path.exists(DB_PATH):
+            _remove_marker()
+
+        opened = super(Database, self).connect(reuse_if_open)
+        if opened:
+            check_tables()
+        return opened
+
+db = Database(DB_PATH, pragmas=DB_PRAGMAS)
 
 if ADDON_DEV:
     import logging
@@ -28,11 +35,11 @@ class HashField(peewee.TextField):
 class PickledField(peewee.BlobField):
     def db_value(self, value):
         if value != None:
-            return super(PickledField, self).db_value(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            return super(PickledField, self).db_value(codec.encode(value))
 
     def python_value(self, value):
         if value != None:
-            return super(PickledField, self).python_value(pickle.loads(str(value)))
+            return super(PickledField, self).python_value(codec.decode(str(value)))
 
 class Model(peewee.Model):
     checksum = ''
@@ -70,7 +77,8 @@ class Model(peewee.Model):
     def replace_many(cls, data):
         with db.atomic():
             for idx in range(0, len(data), DB_MAX_INSERTS):
-                super(Model, cls).replace_many(data[idx:idx+DB_MAX_INSERTS]).execute()
+                # peewee's replace_many calls back into our insert_many override
+                super(Model, cls).insert_many(data[idx:idx+DB_MAX_INSERTS]).on_conflict('REPLACE').execute()
 
     @classmethod
     def insert_many(cls, data):
@@ -104,10 +112,62 @@ class KeyStore(Model):
     class Meta:
         table_name = DB_TABLENAME
 
-tables = [KeyStore]
+tables   = [KeyStore]
+_checked = set()
+_lock    = threading.RLock()
+
+# Modules with models are imported on demand, so their tables get checked on the
+# first connection or, when a connection is already open, as soon as they register
+def register(*models):
+    tables.extend(models)
+    if not db.is_closed():
+        check_tables()
+
+def _read_marker():
+    if ADDON_DEV:
+        return set()
+
+    try:
+        with open(DB_MARKER) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return set()
+
+    if not lines or lines[0] != ADDON_VERSION:
+        return set()
+
+    return set(lines[1:])
+
+def _write_marker(names):
+    try:
+        with open(DB_MARKER, 'w') as f:
+            f.write('\n'.join([ADDON_VERSION] + sorted(names)))
+    except (IOError, OSError):
+        pass
+
+def _remove_marker():
+    if os.path.exists(DB_MARKER):
+        os.remove(DB_MARKER)
+
 def check_tables():
+    with _lock:
+        pending = [table for table in tables if table not in _checked]
+        if not pending:
+            return
+
+        # checksums only change with the addon version, so tables verified under it are skipped
+        verified   = _read_marker()
+        unverified = [table for table in pending if table.table_name() not in verified]
+
+        if unverified:
+            _check(unverified)
+            _write_marker(verified | set(table.table_name() for table in pending))
+
+        _checked.update(pending)
+
+def _check(models):
     with db.atomic():
-        for table in tables:
+        for table in models:
             key      = table.table_name()
             checksum = table.get_checksum()
 
@@ -125,11 +185,9 @@ def delete():
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
 
+    _remove_marker()
+    _checked.clear()
+
 @signals.on(signals.ON_CLOSE)
 def close():
-    db.close()
-
-@signals.on(signals.BEFORE_DISPATCH)
-def connect():
-    db.connect(reuse_if_open=True)
-    check_tables()
\ No newline at end of file
+    db.close()
\ No newline at end of file
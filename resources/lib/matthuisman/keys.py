@@ -0,0 +1,57 @@
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+from .log import log
+from .exceptions import Error
+from .constants import ADDON_VERSION, CACHE_KEY_VERSION, CACHE_KEY_CHECK
+
+_seen = {}
+
+def digest(data):
+    if xxhash:
+        return xxhash.xxh64(data).hexdigest()
+
+    return hashlib.md5(data).hexdigest()
+
+def _encode(item):
+    if isinstance(item, unicode):
+        item = item.encode('utf-8')
+
+    if isinstance(item, (int, long)) and not isinstance(item, bool):
+        return str(item)
+
+    if item is None or isinstance(item, (str, bool, float)):
+        return repr(item)
+
+    if isinstance(item, (list, tuple)):
+        return '[{}]'.format(','.join(_encode(x) for x in item))
+
+    if isinstance(item, dict):
+        return '{{{}}}'.format(','.join('{}:{}'.format(_encode(k), _encode(item[k])) for k in sorted(item)))
+
+    #objects (eg. self) only record which type filled the slot
+    return '<{}>'.format(type(item).__name__)
+
+# keys.build(api.categories, api) => categories.2f0c6a5e3b1d9c47
+# keys.build('subtitle', url)     => subtitle.9a1e...
+def build(namespace, *args, **kwargs):
+    if callable(namespace):
+        name      = namespace.__name__
+        namespace = '{}.{}'.format(namespace.__module__, name)
+    else:
+        name = namespace
+
+    material = '{}|{}|{}|{}|{}'.format(CACHE_KEY_VERSION, ADDON_VERSION, namespace, _encode(args), _encode(kwargs))
+    key      = '{}.{}'.format(name, digest(material))
+
+    if CACHE_KEY_CHECK:
+        seen = _seen.setdefault(key, material)
+        if seen != material:
+            log.error('Cache key collision: {} ({} / {})'.format(key, seen, material))
+            raise Error('Cache key collision: {}'.format(key))
+
+    return key
@@ -80,6 +80,8 @@ class BaseLanguage(object):
     IA_QUALITY_SET              = 32047
     IA_QUALITY_540P             = 32048
     NO_AUTOPLAY_FOUND           = 32049
+    HTTP_STATS                  = 32050
+    NO_HTTP_STATS               = 32051
 
     def __getattribute__(self, name):
         attr = object.__getattribute__(self, name)
@@ -1,140 +1,369 @@
 import sys
+import heapq
+import threading
 from time import time
+from base64 import b64encode, b64decode
 from functools import wraps
 
-try:
-    import cPickle as pickle
-except:
-    import pickle
-
 import xbmcgui
 
 from .log import log
-from .util import hash_6
-from .constants import ADDON_ID, CACHE_EXPIRY, ROUTE_CLEAR_CACHE
-from . import signals, gui, router, settings
-
-cache_key = 'cache.'+ADDON_ID
-_window   = xbmcgui.Window(10000)
-
+from .language import _
+from .constants import ADDON_ID, CACHE_EXPIRY, CACHE_REFRESH_WAIT, CACHE_MEM_BUDGET, ROUTE_CLEAR_CACHE
+from . import signals, gui, router, settings, keys, codec
+
+cache_key   = 'cache.'+ADDON_ID
+_window     = xbmcgui.Window(10000)
+_refreshing = {}
+_lock       = threading.RLock() # set / delete (prefetch and refresh threads) vs save
+
+# Each row is its own window property (cache_key.<key>) holding a base64 codec value.
+# cache_key holds the index, so a dispatch only decodes the rows it reads and only writes back the rows it changed.
+#   index = {'rows': {key: [stale_until, size, last_used, tags]}, 'heap': [(stale_until, key)], 'bytes': 0, 'counts': {}}
 class Cache(object):
-    data = {}
+    data    = {} # rows read or set this dispatch
+    index   = {} # every persisted row (index['rows'])
+    dirty   = set()
+    deleted = set()
+    used    = {} # key => last read, for rows read this dispatch
+    tags    = {} # key => tags, for rows set since the last save
+    counts  = {} # hits / stale / misses since the last save
 
 cache = Cache()
 
+COUNTS = ('hits', 'l2_hits', 'stale', 'misses', 'expired', 'evictions')
+
+def _prop(key):
+    return '{}.{}'.format(cache_key, key)
+
+def _decode(data):
+    try:
+        return codec.decode(b64decode(data))
+    except:
+        return None
+
+def _encode(value):
+    return b64encode(codec.encode(value))
+
+def _load_index():
+    index = _decode(_window.getProperty(cache_key))
+
+    #anything else (eg. the single pickled dict older versions kept here) starts an empty index
+    if not isinstance(index, dict) or 'rows' not in index:
+        index = {'rows': {}, 'heap': [], 'bytes': 0, 'counts': dict((name, 0) for name in COUNTS)}
+
+    return index
+
 @signals.on(signals.BEFORE_DISPATCH)
 def load():
-    if not cache.data and settings.getBool('persist_cache', True):
-        cache.data = {}
+    if settings.getBool('persist_cache', True):
+        cache.index = _load_index()['rows']
+
+def _row(key):
+    row = cache.data.get(key)
+    if row is None and key in cache.index:
+        row = _decode(_window.getProperty(_prop(key)))
+        if row:
+            cache.data[key] = row
+        else:
+            cache.index.pop(key, None)
 
-        data = _window.getProperty(cache_key)
-        
-        if data:
-            try:
-                cache.data = pickle.loads(data)
-            except:
-                pass
+    if row:
+        cache.used[key] = time()
 
-        _window.setProperty(cache_key, "{}")
+    return row
 
-def set(key, value, expires=CACHE_EXPIRY):
+def _count(name):
+    cache.counts[name] = cache.counts.get(name, 0) + 1
+
+def stats():
+    index = _load_index()
+
+    counts = index['counts']
+    for name in cache.counts:
+        counts[name] = counts.get(name, 0) + cache.counts[name]
+
+    return dict(counts, rows=len(index['rows']), bytes=index['bytes'])
+
+# row = [value, expires, stale_until, cost]
+def set(key, value, expires=CACHE_EXPIRY, stale=0, cost=0, tags=None):
     expires = int(time() + expires)
-    cache.data[key] = [value, expires]
-    
+
+    with _lock:
+        cache.data[key] = [value, expires, expires + stale, cost]
+        cache.tags[key] = tuple(tags or ())
+        cache.dirty.add(key)
+        cache.deleted.discard(key)
+
 def get(key, default=None):
-    try:
-        row = cache.data[key]
-    except KeyError:
+    row = _row(key)
+    if not row:
         return default
 
     if row[1] < time():
-        cache.data.pop(key, None)
+        if row[2] < time():
+            delete(key)
         return default
     else:
         return row[0]
 
+def get_stale(key):
+    row = _row(key)
+    if not row or row[2] < time():
+        return None
+
+    return row
+
 def delete(key):
-    return int(cache.data.pop(key, None) != None)
+    with _lock:
+        existed = key in cache.data or key in cache.index
 
-def empty():
-    deleted = len(cache.data)
-    cache.data.clear()
-    log('Mem Cache: Deleted {} Rows'.format(deleted))
+        cache.data.pop(key, None)
+        cache.index.pop(key, None)
+        cache.used.pop(key, None)
+        cache.tags.pop(key, None)
+        cache.dirty.discard(key)
+        cache.deleted.add(key)
 
-def key_for(f, *args, **kwargs):
-    func_name = f.__name__ if callable(f) else f
-    if not enabled() or func_name not in funcs:
-        return None
+    return int(existed)
 
-    return _build_key(func_name, *args, **kwargs)
+def _tags(key):
+    if key in cache.tags:
+        return cache.tags[key]
 
-def _build_key(func_name, *args, **kwargs):
-    key = func_name
+    row = cache.index.get(key)
+    return row[3] if row else ()
 
-    def to_str(item):
-        try:
-            return item.encode('utf-8')
-        except:
-            return str(item)
+# Drops every row tagged with any of the tags, here and in the sqlite cache (mem_cache.cached(l2=...) rows)
+def invalidate(*tags):
+    keys = [key for key in frozenset(cache.index.keys() + cache.tags.keys()) if any(tag in _tags(key) for tag in tags)]
+    for key in keys:
+        delete(key)
+
+    #prefetched results share the cache keys
+    from . import prefetch
+    prefetch.discard(keys)
+
+    log('Mem Cache: Invalidated {} Rows ({})'.format(len(keys), ', '.join(tags)))
 
-    def is_primitive(item):
-        return type(item) in (int, str, dict, list, bool, float, unicode)
-    
-    for k in sorted(args):
-        if is_primitive(k):
-            key += to_str(k)
+    from . import cache as l2_cache
+    l2_cache.invalidate(*tags)
+
+    return len(keys)
+
+def empty():
+    keys = list(cache.data) + [key for key in cache.index if key not in cache.data]
+    for key in keys:
+        delete(key)
 
-    for k in sorted(kwargs):
-        if is_primitive(kwargs[k]):
-            key += to_str(k) + to_str(kwargs[k])
+    log('Mem Cache: Deleted {} Rows'.format(len(keys)))
 
-    return hash_6(key)
+def key_for(f, *args, **kwargs):
+    return keys.build(f, *args, **kwargs)
 
+# l2 = seconds to also keep values in the sqlite cache, which outlives Kodi restarts.
+# Values found there are promoted back into the window cache.
+# tags = list of tags, or a function called with (value, *args, **kwargs) that returns them
 def cached(*args, **kwargs):
-    def decorator(f, expires=CACHE_EXPIRY, key=None):
+    def decorator(f, expires=CACHE_EXPIRY, key=None, stale=0, budget=None, l2=None, tags=None):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            _key = key or _build_key(f.__name__, *args, **kwargs)
+            skip_cache = kwargs.pop('_skip_cache', False)
+            _budget    = kwargs.pop('_budget', budget)
+
+            _key = key or keys.build(f, *args, **kwargs)
             if callable(_key):
                 _key = _key(*args, **kwargs)
 
-            if not kwargs.pop('_skip_cache', False):
+            if not skip_cache:
                 value = get(_key)
                 if value != None:
                     log('Cache Hit: {}'.format(_key))
+                    _count('hits')
                     return value
 
-            value = f(*args, **kwargs)
-            if value != None:
-                set(_key, value, expires)
+                l2_row = _l2_get(_key) if l2 else None
+                if l2_row and l2_row[1] > time():
+                    log('Cache L2 Hit: {}'.format(_key))
+                    _count('l2_hits')
+                    _promote(_key, l2_row, expires, stale)
+                    return l2_row[0]
+
+                # serve stale when within max staleness and a fetch would blow the latency budget
+                row = (get_stale(_key) or l2_row) if stale else None
+                if row and (_budget is None or row[3] > _budget):
+                    log('Cache Stale: {}'.format(_key))
+                    _count('stale')
+                    _refresh(_key, f, args, kwargs, expires, stale, l2, tags)
+                    return row[0]
+
+                _count('misses')
 
-            return value
+            return _fetch(_key, f, args, kwargs, expires, stale, l2, tags, lookup=not skip_cache)
 
         return decorated_function
 
     return lambda f: decorator(f, *args, **kwargs)
 
-@signals.on(signals.AFTER_DISPATCH)
-def remove_expired():
-    _time = time()
-    delete  = []
+def _l2_get(key):
+    # the sqlite cache (and peewee) is only imported once the window cache misses
+    from . import cache as l2_cache
+    return l2_cache.get_stale(key)
 
-    for key in cache.data.keys():
-        if cache.data[key][1] < _time:
-            delete.append(key)
+def _promote(key, row, expires, stale):
+    # never keep the window copy longer than the sqlite one
+    set(key, row[0], min(expires, row[1] - time()), stale, row[3], row[4])
 
-    for key in delete:
-        cache.data.pop(key, None)
+def _lookup(key, l2, expires, stale):
+    value = get(key)
+    if value != None or not l2:
+        return value
 
-    if delete:
-        log('Mem Cache: Deleted {} Expired Rows'.format(len(delete)))
+    row = _l2_get(key)
+    if row and row[1] > time():
+        _promote(key, row, expires, stale)
+        return row[0]
+
+def _fetch(key, f, args, kwargs, expires, stale, l2=None, tags=None, lookup=False):
+    def store(value, cost):
+        value_tags = tags(value, *args, **kwargs) if callable(tags) else tags
+        set(key, value, expires, stale, cost=cost, tags=value_tags)
+
+        if l2:
+            from . import cache as l2_cache
+            l2_cache.set(key, value, l2, stale, cost=cost, tags=value_tags)
+
+    def fetch():
+        start = time()
+        value = f(*args, **kwargs)
+        if value != None:
+            store(value, time() - start)
+
+        return value
+
+    # only one thread or process fetches a key at a time, the ones waiting on it get its result
+    from . import singleflight
+    return singleflight.do('mem_cache.' + key, fetch, lookup=(lambda: _lookup(key, l2, expires, stale)) if lookup else None, store=store)
+
+def _refresh(key, f, args, kwargs, expires, stale, l2=None, tags=None):
+    thread = _refreshing.get(key)
+    if thread and thread.is_alive():
+        return
 
+    def refresh():
+        try:
+            _fetch(key, f, args, kwargs, expires, stale, l2, tags)
+        except Exception as e:
+            log.debug('Cache Refresh Failed: {} ({})'.format(key, e))
+
+    thread = _refreshing[key] = threading.Thread(target=refresh)
+    thread.daemon = True
+    thread.start()
+
+@signals.on(signals.AFTER_DISPATCH)
+def wait_refreshes():
+    # the listing is already with Kodi, so give refreshes a chance to land before the cache is persisted
+    end = time() + CACHE_REFRESH_WAIT
+    for key in _refreshing.keys():
+        _refreshing.pop(key).join(max(0, end - time()))
+
+@signals.on(signals.AFTER_DISPATCH)
+def remove_expired():
     if settings.getBool('persist_cache', True):
-        _window.setProperty(cache_key, pickle.dumps(cache.data))
+        return save()
+
+    _time   = time()
+    expired = [key for key in cache.data.keys() if cache.data[key][2] < _time]
+
+    for key in expired:
+        delete(key)
+
+def _remove(index, key):
+    index['bytes'] -= index['rows'].pop(key)[1]
+    _window.clearProperty(_prop(key))
+
+def save():
+    # prefetch threads started just before can still be setting rows.
+    # They wait here, so every row is either in this save or dirty again for the next one.
+    with _lock:
+        dirty   = list(cache.dirty)
+        deleted = list(cache.deleted)
+        used    = dict(cache.used)
+        counts  = dict(cache.counts)
+        _time   = time()
+
+        # another process may have changed the index since this dispatch loaded it
+        index = _load_index()
+        rows  = index['rows']
+        heap  = index['heap']
+
+        for key in deleted:
+            if key in rows:
+                _remove(index, key)
+            else:
+                _window.clearProperty(_prop(key))
+
+        for key in used:
+            if key in rows:
+                rows[key][2] = max(rows[key][2], used[key])
+
+        for key in dirty:
+            row      = cache.data.get(key)
+            row_tags = cache.tags.pop(key, ())
+            if not row:
+                continue
+
+            if key in rows:
+                _remove(index, key)
+
+            data = _encode(row)
+            if len(data) > CACHE_MEM_BUDGET:
+                continue
+
+            _window.setProperty(_prop(key), data)
+            rows[key] = [row[2], len(data), used.get(key, _time), row_tags]
+            index['bytes'] += len(data)
+            heapq.heappush(heap, (row[2], key))
+
+        # expired rows come off the top of the heap (entries for rows since replaced or deleted are skipped)
+        while heap and heap[0][0] < _time:
+            stale_until, key = heapq.heappop(heap)
+            if key in rows and rows[key][0] == stale_until:
+                _remove(index, key)
+                counts['expired'] = counts.get('expired', 0) + 1
+
+        # least recently used rows go until the rest fit the budget
+        if index['bytes'] > CACHE_MEM_BUDGET:
+            for key in sorted(rows, key=lambda key: rows[key][2]):
+                _remove(index, key)
+                counts['evictions'] = counts.get('evictions', 0) + 1
+                if index['bytes'] <= CACHE_MEM_BUDGET:
+                    break
+
+        if len(heap) > len(rows) * 2:
+            heap = index['heap'] = [(rows[key][0], key) for key in rows]
+            heapq.heapify(heap)
+
+        for name in counts:
+            index['counts'][name] = index['counts'].get(name, 0) + counts[name]
+
+        _window.setProperty(cache_key, _encode(index))
+
+        if any(counts.values()):
+            log('Mem Cache: {} Rows, {}KB, {}'.format(len(rows), index['bytes'] // 1024,
+                ', '.join('{} {}'.format(counts.get(name, 0), name) for name in COUNTS)))
+
+        cache.dirty.clear()
+        cache.deleted.clear()
+        for name in cache.counts:
+            cache.counts[name] -= counts.get(name, 0)
+        cache.used.clear()
         cache.data.clear()
+        cache.index = {}
 
 @router.route(ROUTE_CLEAR_CACHE)
 def clear_cache(key, **kwargs):
-    delete_count = delete(key)
+    from . import cache as l2_cache
+    delete_count = max(delete(key), l2_cache.delete(key))
     msg = _(_.PLUGIN_CACHE_REMOVED, delete_count=delete_count)
     gui.notification(msg)
\ No newline at end of file
@@ -6,8 +6,8 @@ from functools import wraps
 
 import xbmc, xbmcplugin
 
-from . import router, gui, settings, userdata, inputstream, signals
-from .constants import ROUTE_SETTINGS, ROUTE_RESET, ROUTE_SERVICE, ROUTE_CLEAR_CACHE, ROUTE_IA_SETTINGS, ROUTE_IA_INSTALL, ROUTE_IA_QUALITY, ADDON_ICON, ADDON_FANART, ADDON_ID, ADDON_NAME, ROUTE_AUTOPLAY_TAG, ADDON_PROFILE
+from . import router, gui, settings, userdata, signals
+from .constants import ROUTE_SETTINGS, ROUTE_RESET, ROUTE_SERVICE, ROUTE_CLEAR_CACHE, ROUTE_HTTP_STATS, ROUTE_IA_SETTINGS, ROUTE_IA_INSTALL, ROUTE_IA_QUALITY, ADDON_ICON, ADDON_FANART, ADDON_ID, ADDON_NAME, ROUTE_AUTOPLAY_TAG, ADDON_PROFILE
 from .log import log
 from .language import _
 from .exceptions import PluginError
@@ -108,18 +108,26 @@ def _home(**kwargs):
 
 @route(ROUTE_IA_QUALITY)
 def _ia_quality(**kwargs):
+    from . import inputstream
     inputstream.set_quality()
 
 @route(ROUTE_IA_SETTINGS)
 def _ia_settings(**kwargs):
+    from . import inputstream
     _close()
     inputstream.open_settings()
 
 @route(ROUTE_IA_INSTALL)
 def _ia_install(**kwargs):
+    from . import inputstream
     _close()
     inputstream.install_widevine(reinstall=True)
 
+@router.route(ROUTE_HTTP_STATS)
+def _http_stats(**kwargs):
+    from . import stats
+    stats.show()
+
 def reboot():
     _close()
     xbmc.executebuiltin('Reboot')
@@ -154,6 +162,10 @@ def _reset(**kwargs):
 @route(ROUTE_SERVICE)
 def _service(**kwargs):
     try:
+        #expired cache rows are cleaned here rather than on every dispatch
+        from . import cache
+        cache.clean()
+
         signals.emit(signals.ON_SERVICE)
     except Exception as e:
         #catch all errors so dispatch doesn't show error
@@ -165,6 +177,10 @@ def _handle():
     except:
         return -1
 
+# RunPlugin (eg. the service every few minutes) runs without a handle, so nobody is browsing
+def is_interactive():
+    return _handle() > 0
+
 def _autoplay(folder, pattern):
     if '#' in pattern:
         pattern, count = pattern.split('#')
@@ -0,0 +1,105 @@
+import threading
+from time import time
+from functools import wraps
+
+from . import signals, keys
+from .log import log
+from .constants import PREFETCH_EXPIRY
+
+_tasks  = {}
+_queued = []
+_lock   = threading.Lock()
+
+class Task(threading.Thread):
+    def __init__(self, key, f, args, kwargs):
+        super(Task, self).__init__()
+        self.daemon    = True
+        self.key       = key
+        self.result    = None
+        self.fetched   = 0
+        self.cancelled = False
+
+        self._f      = f
+        self._args   = args
+        self._kwargs = kwargs
+
+    def run(self):
+        if self.cancelled:
+            return
+
+        try:
+            result = self._f(*self._args, **self._kwargs)
+        except Exception as e:
+            log.debug('Prefetch Failed: {} ({})'.format(self.key, e))
+            return
+
+        if not self.cancelled:
+            self.fetched = time()
+            self.result  = result
+
+def _valid(task):
+    return task.result is not None and time() - task.fetched < PREFETCH_EXPIRY
+
+# @prefetch.prefetchable
+def prefetchable(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if kwargs.pop('_skip_prefetch', False):
+            return f(*args, **kwargs)
+
+        key = keys.build(f, *args, **kwargs)
+        with _lock:
+            task = _tasks.pop(key, None)
+
+        if task and _valid(task):
+            log('Prefetch Hit: {}'.format(key))
+            return task.result
+
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+# prefetch.start(api.filter_media, 'keyword', 'space', page=2)
+def start(f, *args, **kwargs):
+    # the key is built with self like the decorated method sees it, so it matches the mem_cache key
+    instance = getattr(f, '__self__', None)
+    key      = keys.build(f, *((instance,) + args if instance is not None else args), **kwargs)
+    kwargs['_skip_prefetch'] = True
+
+    with _lock:
+        if key in _tasks:
+            return
+
+        task = _tasks[key] = Task(key, f, args, kwargs)
+        _queued.append(task)
+
+def discard(keys):
+    with _lock:
+        for key in keys:
+            task = _tasks.pop(key, None)
+            if task:
+                task.cancelled = True
+
+@signals.on(signals.AFTER_DISPATCH)
+def run_queued():
+    with _lock:
+        tasks = _queued[:]
+        del _queued[:]
+
+    for task in tasks:
+        log.debug('Prefetch Start: {}'.format(task.key))
+        task.start()
+
+@signals.on(signals.BEFORE_DISPATCH)
+def cancel_pending():
+    with _lock:
+        for key in _tasks.keys():
+            task = _tasks[key]
+            if task.result is None:
+                task.cancelled = True
+                _tasks.pop(key)
+                log.debug('Prefetch Cancelled: {}'.format(key))
+            elif not _valid(task):
+                _tasks.pop(key)
+
+        del _queued[:]
@@ -0,0 +1,100 @@
+import os
+import re
+import time
+from urlparse import parse_qsl
+
+from . import settings
+from .constants import ADDON_PROFILE, PROFILER_TAG, PROFILER_SETTING, PROFILER_ENV, PROFILER_DIR, PROFILER_KEEP, PROFILER_LOG_LINES, PROFILER_MIN_TIME, ROUTE_TAG
+from .log import log
+
+def enabled(url):
+    if os.environ.get(PROFILER_ENV):
+        return True
+
+    if '?' in url and PROFILER_TAG in url:
+        if PROFILER_TAG in dict(parse_qsl(url.split('?', 1)[1], keep_blank_values=True)):
+            return True
+
+    return settings.getBool(PROFILER_SETTING, False)
+
+def run(func, url):
+    #only profiled dispatches pay for importing the profiler
+    import cProfile
+
+    profile = cProfile.Profile()
+    profile.enable()
+
+    try:
+        return func(url)
+    finally:
+        profile.disable()
+
+        try:
+            _save(profile, url)
+        except Exception as e:
+            log.debug('Failed to save profile: {}'.format(e))
+
+def _save(profile, url):
+    import pstats
+    from StringIO import StringIO
+
+    path = os.path.join(ADDON_PROFILE, PROFILER_DIR)
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    route = dict(parse_qsl(url.split('?', 1)[-1])).get(ROUTE_TAG) or 'index'
+    name  = '{}_{}'.format(time.strftime('%Y%m%d-%H%M%S'), re.sub('[^A-Za-z0-9_]', '', route))
+
+    stats = pstats.Stats(profile)
+    stats.dump_stats(os.path.join(path, name + '.pstats'))
+
+    with open(os.path.join(path, name + '.collapsed'), 'w') as f:
+        for stack, value in collapse(stats):
+            f.write('{} {}\n'.format(';'.join(stack), value))
+
+    output = StringIO()
+    stats.stream = output
+    stats.sort_stats('cumulative').print_stats(PROFILER_LOG_LINES)
+    log.debug('Profile saved: {}\n{}'.format(os.path.join(path, name), output.getvalue()))
+
+    files = sorted(x for x in os.listdir(path) if x.endswith('.pstats'))
+    for file_name in files[:-PROFILER_KEEP]:
+        for ext in ('.pstats', '.collapsed'):
+            try: os.remove(os.path.join(path, file_name[:-len('.pstats')] + ext))
+            except: pass
+
+def _label(func):
+    file_name, line, func_name = func
+    return '{}:{}({})'.format(os.path.basename(file_name), line, func_name)
+
+def collapse(stats):
+    # cProfile only keeps caller -> callee edges, so full stacks are rebuilt by splitting
+    # each function's time between its callers in proportion to the time each call path took
+    callees = {}
+    roots   = []
+
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    rows = []
+
+    def walk(func, stack, fraction):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        stack = stack + [_label(func)]
+
+        value = int(tt * fraction * 1000000)
+        if value:
+            rows.append((stack, value))
+
+        for child, edge_ct in callees.get(func, []):
+            child_ct = stats.stats[child][3]
+            if edge_ct * fraction > PROFILER_MIN_TIME and _label(child) not in stack:
+                walk(child, stack, fraction * min(edge_ct / child_ct, 1.0))
+
+    for func in roots:
+        walk(func, [], 1.0)
+
+    return rows
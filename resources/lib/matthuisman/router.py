@@ -1,8 +1,8 @@
 from urlparse import parse_qsl
 from urllib import urlencode, unquote
 
-from . import signals
-from .constants import ROUTE_TAG, ADDON_ID, ROUTE_LIVE_TAG, ROUTE_LIVE_SUFFIX, ROUTE_URL_TAG
+from . import signals, profiler
+from .constants import ROUTE_TAG, ADDON_ID, ROUTE_LIVE_TAG, ROUTE_LIVE_SUFFIX, ROUTE_URL_TAG, PROFILER_TAG
 from .log import log
 from .language import _
 from .exceptions import RouterError, Exit
@@ -30,6 +30,7 @@ def parse_url(url):
             params[key] = unquote(params[key])
 
         _url     = params.pop(ROUTE_TAG, '')
+        params.pop(PROFILER_TAG, None)
     else:
         params = {}
         _url = url
@@ -88,9 +89,15 @@ def redirect(url):
 
 # router.dispatch('?_=_settings')
 def dispatch(url):
+    if profiler.enabled(url):
+        return profiler.run(_dispatch, url)
+
+    _dispatch(url)
+
+def _dispatch(url):
     with signals.throwable():
         signals.emit(signals.BEFORE_DISPATCH)
         function, params = parse_url(url)
         function(**params)
 
-    signals.emit(signals.AFTER_DISPATCH)
\ No newline at end of file
+    signals.emit_all(signals.AFTER_DISPATCH)
\ No newline at end of file
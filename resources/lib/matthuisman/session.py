@@ -1,11 +1,68 @@
+import socket
+import threading
+from time import time
+
 import requests
+from requests.packages.urllib3.connection import HTTPConnection, HTTPSConnection
+from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.packages.urllib3.util import connection as urllib3_connection
 
-from . import userdata, settings
+from . import userdata, settings, stats
 from .log import log
-from .constants import SESSION_TIMEOUT, SESSION_ATTEMPTS, SESSION_CHUNKSIZE
+from .constants import SESSION_TIMEOUT, SESSION_ATTEMPTS, SESSION_CHUNKSIZE, SESSION_REVALIDATE_EXPIRY, SESSION_PRECONNECT_IDLE
+
+_local = threading.local()
+
+# urllib3's create_connection resolves through this, so the lookup it already does is the one timed
+class TimedSocket(object):
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+    def getaddrinfo(self, *args, **kwargs):
+        start = time()
+        try:
+            return socket.getaddrinfo(*args, **kwargs)
+        finally:
+            timings = getattr(_local, 'timings', None)
+            if timings is not None:
+                timings['dns'] = timings.get('dns', 0) + time() - start
+
+urllib3_connection.socket = TimedSocket()
+
+class TimedConnection(object):
+    # Splits connection setup into dns / connect timings for stats
+    def _new_conn(self):
+        timings = getattr(_local, 'timings', None)
+        if timings is None:
+            return super(TimedConnection, self)._new_conn()
+
+        timings['dns'] = 0
+        start = time()
+        conn  = super(TimedConnection, self)._new_conn()
+        timings['connect'] = time() - start - timings['dns']
+
+        return conn
+
+class TimedHTTPConnection(TimedConnection, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+    def connect(self):
+        start = time()
+        super(TimedHTTPSConnection, self).connect()
+
+        timings = getattr(_local, 'timings', None)
+        if timings is not None and 'connect' in timings:
+            timings['tls'] = time() - start - timings['dns'] - timings['connect']
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
 
 class Session(requests.Session):
-    def __init__(self, headers=None, cookies_key=None, base_url='{}', timeout=None, attempts=None):
+    def __init__(self, headers=None, cookies_key=None, base_url='{}', timeout=None, attempts=None, revalidate=False):
         super(Session, self).__init__()
 
         self._headers     = headers or {}
@@ -14,12 +71,17 @@ class Session(requests.Session):
         self._timeout     = timeout or SESSION_TIMEOUT
         self._attempts    = attempts or SESSION_ATTEMPTS
         self._verify      = settings.getBool('verify_ssl', True)
+        self._revalidate  = revalidate
+        self._last_used   = 0
+
+        for adapter in self.adapters.values():
+            adapter.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
 
         self.headers.update(self._headers)
         if self._cookies_key:
             self.cookies.update(userdata.get(self._cookies_key, {}))
 
-    def request(self, method, url, timeout=None, attempts=None, verify=None, **kwargs):
+    def request(self, method, url, timeout=None, attempts=None, verify=None, revalidate=None, **kwargs):
         if not url.startswith('http'):
             url = self._base_url.format(url)
 
@@ -27,14 +89,109 @@ class Session(requests.Session):
         kwargs['verify'] = verify or self._verify
         attempts = attempts or self._attempts
 
+        if revalidate is None:
+            revalidate = self._revalidate
+
+        if revalidate and method.lower() == 'get':
+            return self._revalidate_request(method, url, attempts, **kwargs)
+
+        return self._request(method, url, attempts, **kwargs)
+
+    def _request(self, method, url, attempts, **kwargs):
+        self._last_used = time()
+
         for i in range(1, attempts+1):
             log('Attempt {}/{}: {} {} {}'.format(i, attempts, method, url, kwargs if method.lower() != 'post' else ""))
 
+            _local.timings = timings = {}
+            start = time()
+
             try:
-                return super(Session, self).request(method, url, **kwargs)
+                resp = super(Session, self).request(method, url, **kwargs)
             except:
                 if i == attempts:
+                    stats.record(method, url, 'error', timings, retries=i-1)
                     raise
+                continue
+            finally:
+                _local.timings = None
+
+            #elapsed runs from sending the request until the headers are parsed
+            timings['ttfb']  = resp.elapsed.total_seconds() - sum(timings.get(name, 0) for name in ('dns', 'connect', 'tls'))
+            timings['total'] = time() - start
+            size = len(resp._content) if resp._content else int(resp.headers.get('Content-Length') or 0)
+            stats.record(method, url, resp.status_code, timings, size=size, retries=i-1)
+
+            return resp
+
+    def _revalidate_request(self, method, url, attempts, **kwargs):
+        from . import cache, keys
+
+        key    = keys.build('session', requests.Request(method, url, params=kwargs.get('params')).prepare().url)
+        stored = cache.get(key)
+
+        if stored:
+            headers = dict(kwargs.get('headers') or {})
+            if stored['etag']:
+                headers['If-None-Match'] = stored['etag']
+            if stored['last_modified']:
+                headers['If-Modified-Since'] = stored['last_modified']
+            kwargs['headers'] = headers
+
+        resp = self._request(method, url, attempts, **kwargs)
+
+        if stored and resp.status_code == 304:
+            log('Not Modified: {}'.format(url))
+            resp.status_code = 200
+            resp.encoding    = stored['encoding']
+            resp._content    = stored['body']
+            resp.headers.setdefault('Content-Type', stored['content_type'])
+            cache.set(key, stored, expires=SESSION_REVALIDATE_EXPIRY)
+
+        elif resp.status_code == 200 and (resp.headers.get('ETag') or resp.headers.get('Last-Modified')):
+            cache.set(key, {
+                'etag': resp.headers.get('ETag'),
+                'last_modified': resp.headers.get('Last-Modified'),
+                'content_type': resp.headers.get('Content-Type'),
+                'encoding': resp.encoding,
+                'body': resp.content,
+            }, expires=SESSION_REVALIDATE_EXPIRY)
+
+        return resp
+
+    def reload_settings(self):
+        self._verify = settings.getBool('verify_ssl', True)
+
+    def preconnect(self, url):
+        #a recently used pool still has a live keep-alive connection
+        if time() - self._last_used < SESSION_PRECONNECT_IDLE:
+            return
+
+        if not url.startswith('http'):
+            url = self._base_url.format(url)
+
+        def _preconnect():
+            try:
+                self.head(url, attempts=1).close()
+            except Exception as e:
+                log.debug('Preconnect failed: {}'.format(e))
+
+        thread = threading.Thread(target=_preconnect)
+        thread.daemon = True
+        thread.start()
+
+    def pool_stats(self):
+        num_requests = num_connections = 0
+
+        for adapter in self.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool:
+                    num_requests    += pool.num_requests
+                    num_connections += pool.num_connections
+
+        return num_requests, num_connections
 
     def save_cookies(self):
         if not self._cookies_key:
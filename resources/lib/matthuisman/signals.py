@@ -25,6 +25,15 @@ def emit(signal, *args, **kwargs):
     for f in _signals.get(signal, []):
         f(*args, **kwargs)
 
+# every handler runs even when one before it fails (eg. AFTER_DISPATCH, so the cache still flushes)
+def emit_all(signal, *args, **kwargs):
+    log.debug("SIGNAL: {}".format(signal))
+    for f in _signals.get(signal, []):
+        try:
+            f(*args, **kwargs)
+        except Exception as e:
+            log.exception(e)
+
 @contextmanager
 def throwable():
     try:
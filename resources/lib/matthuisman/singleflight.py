@@ -0,0 +1,146 @@
+import threading
+from time import time, sleep
+from uuid import uuid4
+
+from . import peewee, database
+from .log import log
+from .constants import SINGLEFLIGHT_TABLENAME, SINGLEFLIGHT_LEASE, SINGLEFLIGHT_WAIT, SINGLEFLIGHT_POLL, SINGLEFLIGHT_RESULT
+
+_flights      = {}
+_flights_lock = threading.Lock()
+
+# A lease is held by the process fetching key. Processes that wait on it add themselves to waiters,
+# and only when there are waiters is the result handed over, under '<key>#<owner>' so later callers never see it.
+class Lease(database.Model):
+    key     = peewee.TextField(primary_key=True)
+    owner   = peewee.TextField()
+    expires = peewee.FloatField()
+    waiters = peewee.IntegerField(default=0)
+    value   = database.PickledField(null=True)
+
+    class Meta:
+        table_name = SINGLEFLIGHT_TABLENAME
+
+# a fetch running in this process, for the threads that wait on it
+class Flight(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.ok    = False
+
+def _result_key(key, owner):
+    return '{}#{}'.format(key, owner)
+
+# value = singleflight.do(key, fetch, lookup=lambda: cache.get(key), store=lambda value, cost: cache.set(key, value))
+# Callers that arrive while a fetch of key is running get its result (store is called when it came from another process).
+# Once the fetch is done nothing of it is kept, so the next caller does its own lookup and fetch.
+def do(key, fetch, lookup=None, store=None):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        flight.event.wait(SINGLEFLIGHT_WAIT)
+        if flight.ok:
+            log('Single Flight: Shared result for {}'.format(key))
+            return flight.value
+
+        return _do(key, fetch, lookup, store)
+
+    try:
+        flight.value = _do(key, fetch, lookup, store)
+        flight.ok    = True
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.event.set()
+
+    return flight.value
+
+def _do(key, fetch, lookup, store):
+    # the fetch this caller missed may have just finished
+    if lookup:
+        value = lookup()
+        if value is not None:
+            return value
+
+    start = time()
+    owner = uuid4().hex
+    held  = _acquire(key, owner)
+
+    if held is True:
+        try:
+            value = fetch()
+        except:
+            _release(key, owner)
+            raise
+
+        _release(key, owner, value)
+        return value
+
+    log.debug('Single Flight: Waiting on another fetch of {}'.format(key))
+
+    end = time() + SINGLEFLIGHT_WAIT
+    while time() < end and Lease.select().where(Lease.key == key, Lease.owner == held).exists():
+        sleep(SINGLEFLIGHT_POLL)
+
+    found, value = _take(key, held)
+    if found:
+        log('Single Flight: Shared result for {}'.format(key))
+        if store and value is not None:
+            store(value, time() - start)
+        return value
+
+    if lookup:
+        value = lookup()
+        if value is not None:
+            return value
+
+    return fetch()
+
+# True when owner now holds the lease, else the owner of the lease to wait on
+def _acquire(key, owner):
+    now = time()
+
+    with database.db.atomic('IMMEDIATE'):
+        Lease.delete_where(Lease.expires < now)
+        Lease.insert(key=key, owner=owner, expires=now + SINGLEFLIGHT_LEASE).on_conflict_ignore().execute()
+
+        row = Lease.get_or_none(Lease.key == key)
+        if row.owner == owner:
+            return True
+
+        Lease.update(waiters=Lease.waiters + 1).where(Lease.key == key, Lease.owner == row.owner).execute()
+        return row.owner
+
+def _release(key, owner, value=None):
+    # nobody waited (the usual case): a single delete
+    if Lease.delete_where(Lease.key == key, Lease.owner == owner, Lease.waiters == 0):
+        return
+
+    with database.db.atomic('IMMEDIATE'):
+        row = Lease.get_or_none(Lease.key == key, Lease.owner == owner)
+        Lease.delete_where(Lease.key == key, Lease.owner == owner)
+
+        if row and row.waiters and value is not None:
+            Lease.insert(key=_result_key(key, owner), owner=owner, expires=time() + SINGLEFLIGHT_RESULT, waiters=row.waiters, value=value).execute()
+
+def _take(key, owner):
+    result_key = _result_key(key, owner)
+
+    with database.db.atomic('IMMEDIATE'):
+        row = Lease.get_or_none(Lease.key == result_key)
+        if not row:
+            return False, None
+
+        # the last waiter to read it removes it
+        if row.waiters <= 1:
+            Lease.delete_where(Lease.key == result_key)
+        else:
+            Lease.update(waiters=Lease.waiters - 1).where(Lease.key == result_key).execute()
+
+    return True, row.value
+
+database.register(Lease)
@@ -0,0 +1,151 @@
+import re
+import threading
+from time import time
+from bisect import bisect_left
+from urlparse import urlparse
+
+from . import peewee, database, signals, gui
+from .constants import STATS_TABLENAME, STATS_WINDOW, STATS_WINDOWS, STATS_BUCKETS, STATS_MAX_ENDPOINTS
+from .log import log
+from .language import _
+
+TIMINGS = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+_id_re   = re.compile(r'^(\d+|[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$', re.I)
+_lock    = threading.Lock()
+_pending = {}
+
+class HttpStats(database.Model):
+    endpoint = peewee.TextField()
+    window   = peewee.IntegerField()
+    data     = database.PickledField()
+
+    class Meta:
+        table_name  = STATS_TABLENAME
+        primary_key = peewee.CompositeKey('endpoint', 'window')
+
+def endpoint(method, url):
+    # https://api.curiositystream.com/v1/media/1234 => GET api.curiositystream.com/v1/media/{id}
+    parsed = urlparse(url)
+    path   = '/'.join('{id}' if _id_re.match(part) else part for part in parsed.path.split('/'))
+    return '{} {}{}'.format(method.upper(), parsed.netloc, path)
+
+def _new():
+    data = {'count': 0, 'retries': 0, 'bytes': 0, 'status': {}}
+    for name in TIMINGS:
+        data[name] = [0] * (len(STATS_BUCKETS) + 1)
+    return data
+
+def _merge(data, other):
+    for key in ('count', 'retries', 'bytes'):
+        data[key] += other[key]
+
+    for status in other['status']:
+        data['status'][status] = data['status'].get(status, 0) + other['status'][status]
+
+    for name in TIMINGS:
+        data[name] = [a + b for a, b in zip(data[name], other[name])]
+
+def record(method, url, status, timings, size=0, retries=0):
+    key = endpoint(method, url)
+
+    with _lock:
+        if key not in _pending and len(_pending) >= STATS_MAX_ENDPOINTS:
+            key = '{} {{other}}'.format(method.upper())
+
+        data = _pending.get(key)
+        if data is None:
+            data = _pending[key] = _new()
+
+        data['count']   += 1
+        data['retries'] += retries
+        data['bytes']   += size
+        data['status'][status] = data['status'].get(status, 0) + 1
+
+        for name in TIMINGS:
+            #dns/connect/tls are only timed when a new connection was opened
+            if timings.get(name) is not None:
+                data[name][bisect_left(STATS_BUCKETS, timings[name] * 1000)] += 1
+
+def _window():
+    return int(time() // STATS_WINDOW)
+
+@signals.on(signals.AFTER_DISPATCH)
+def flush():
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+
+    if not pending:
+        return
+
+    window = _window()
+
+    try:
+        with database.db.connection_context():
+            with database.db.atomic():
+                query = HttpStats.select().where(HttpStats.window == window, HttpStats.endpoint.in_(list(pending.keys())))
+                for row in query:
+                    _merge(row.data, pending[row.endpoint])
+                    pending[row.endpoint] = row.data
+
+                HttpStats.replace_many([{'endpoint': key, 'window': window, 'data': pending[key]} for key in pending])
+                HttpStats.delete_where(HttpStats.window <= window - STATS_WINDOWS)
+    except Exception as e:
+        log.debug('Failed to save http stats: {}'.format(e))
+
+def percentile(buckets, q):
+    total = sum(buckets)
+    if not total:
+        return None
+
+    count = 0
+    for idx, value in enumerate(buckets):
+        count += value
+        if count >= total * q:
+            #upper bound of the bucket in ms (None = slower than the last bucket)
+            return STATS_BUCKETS[idx] if idx < len(STATS_BUCKETS) else None
+
+def summary():
+    merged = {}
+
+    query = HttpStats.select().where(HttpStats.window > _window() - STATS_WINDOWS)
+    with _lock:
+        rows = [(row.endpoint, row.data) for row in query] + list(_pending.items())
+
+    for key, data in rows:
+        if key not in merged:
+            merged[key] = _new()
+        _merge(merged[key], data)
+
+    return merged
+
+def report():
+    lines = []
+
+    data = summary()
+    for key in sorted(data, key=lambda key: -data[key]['count']):
+        row = data[key]
+        lines.append(u'[B]{}[/B]'.format(key))
+        lines.append(u'requests: {count}  retries: {retries}  avg size: {size}KB  status: {status}'.format(count=row['count'], retries=row['retries'],
+            size=row['bytes'] // max(row['count'], 1) // 1024, status=', '.join('{}x{}'.format(k, v) for k, v in sorted(row['status'].items()))))
+
+        for name in TIMINGS:
+            if not sum(row[name]):
+                continue
+
+            values = []
+            for q in (0.5, 0.95, 0.99):
+                value = percentile(row[name], q)
+                values.append('<{}'.format(value) if value else '>{}'.format(STATS_BUCKETS[-1]))
+
+            lines.append(u'  {:<8} p50 {}ms  p95 {}ms  p99 {}ms  (n={})'.format(name, values[0], values[1], values[2], sum(row[name])))
+
+        lines.append(u'')
+
+    return u'\n'.join(lines)
+
+def show():
+    gui.text(report() or _.NO_HTTP_STATS, heading=_.HTTP_STATS)
+
+database.register(HttpStats)
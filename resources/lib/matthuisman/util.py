@@ -1,6 +1,7 @@
 import os
 import time
 import hashlib
+import threading
 
 import xbmc
 
@@ -26,6 +27,70 @@ def md5sum(filepath):
 
     return hashlib.md5(open(filepath,'rb').read()).hexdigest()
 
+def thread_map(func, items, workers=4, timeout=None):
+    items   = list(items)
+    results = [None] * len(items)
+    pending = list(range(len(items)))
+    started = {}
+    done    = {}
+    lock    = threading.Condition()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+
+                idx = pending.pop(0)
+                started[idx] = time.time()
+
+            try:
+                result = func(items[idx])
+            except Exception as e:
+                log.debug('Thread map failed: {}'.format(e))
+                result = None
+
+            with lock:
+                done[idx] = result
+                lock.notify_all()
+
+    def start_worker():
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    for i in range(min(workers, len(items))):
+        start_worker()
+
+    expired = set()
+    with lock:
+        while len(done) + len(expired) < len(items):
+            wait = 1.0
+
+            if timeout:
+                now = time.time()
+                for idx in started:
+                    if idx in done or idx in expired:
+                        continue
+
+                    remaining = started[idx] + timeout - now
+                    if remaining <= 0:
+                        log.debug('Thread map item {} timed out after {}s'.format(idx, timeout))
+                        expired.add(idx)
+                        # the stuck thread keeps its slot, so start another to drain the queue
+                        start_worker()
+                    else:
+                        wait = min(wait, remaining)
+
+            if len(done) + len(expired) < len(items):
+                lock.wait(wait)
+
+        for idx in done:
+            if idx not in expired:
+                results[idx] = done[idx]
+
+    return results
+
 def get_kodi_version():
     try:
         return int(xbmc.getInfoLabel("System.BuildVersion").split('.')[0])
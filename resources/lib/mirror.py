@@ -0,0 +1,225 @@
+import re
+import time
+
+from matthuisman import database, peewee
+from matthuisman.log import log
+
+from .models import Category, Collection, Section, Media, MediaIndex, SyncState
+from .constants import MIRROR_SYNC_INTERVAL, MIRROR_SYNC_BUDGET, FEATURED_ID, PAGE_SIZE
+from . import projection
+
+STATE_KEY   = 'state'
+CATALOG_KEY = 'catalog'
+
+_fts = None
+
+def _category_key(name):
+    return 'category.{}'.format(name)
+
+def _leaf_categories(rows):
+    names = []
+
+    for row in rows:
+        subcategories = row.get('subcategories')
+        if subcategories:
+            names.extend(_leaf_categories(subcategories))
+        else:
+            names.append(row['name'])
+
+    return names
+
+def _paginated(query, page):
+    total_pages = (query.count() + PAGE_SIZE - 1) // PAGE_SIZE
+    if page > total_pages:
+        return None
+
+    rows = query.offset((page-1) * PAGE_SIZE).limit(PAGE_SIZE)
+    return {'data': [x.data for x in rows], 'paginator': {'total_pages': total_pages}}
+
+def categories():
+    return [x.data for x in Category.select().order_by(Category.position)]
+
+def sections():
+    return [x.data for x in Section.select().order_by(Section.position)]
+
+def collections(page=1):
+    if not SyncState.get_value('collections'):
+        return None
+
+    return _paginated(Collection.select().order_by(Collection.position), page)
+
+def filter_media(filterby, term=None, page=1):
+    if filterby != 'category' or not SyncState.get_value(_category_key(term)):
+        return None
+
+    return _paginated(Media.select().where(Media.category == term).order_by(Media.position), page)
+
+def search(query, page=1):
+    global _fts
+
+    if not SyncState.get_value(CATALOG_KEY):
+        return None
+
+    if not isinstance(query, unicode):
+        query = query.decode('utf-8')
+
+    words = re.findall(r'\w+', query.lower(), re.UNICODE)
+    if not words:
+        return None
+
+    if _fts is None:
+        _fts = MediaIndex.is_fts()
+
+    select = MediaIndex.select(MediaIndex.docid, MediaIndex.title)
+    if _fts:
+        match = u' '.join(u'{}*'.format(x) for x in words)
+        select = select.where(peewee.SQL('"{}" MATCH ?'.format(MediaIndex.table_name()), [match]))
+    else:
+        for word in words:
+            like = u'%{}%'.format(word)
+            select = select.where(MediaIndex.title ** like | MediaIndex.description ** like | MediaIndex.category ** like)
+
+    rows = list(select.tuples())
+    if not rows:
+        return None
+
+    #title matches first, then catalog order
+    rows.sort(key=lambda row: -sum(1 for x in words if x in row[1].lower()))
+
+    total_pages = (len(rows) + PAGE_SIZE - 1) // PAGE_SIZE
+    ids     = [row[0] for row in rows[(page-1) * PAGE_SIZE:page * PAGE_SIZE]]
+    records = dict(MediaIndex.select(MediaIndex.docid, MediaIndex.data).where(MediaIndex.docid << ids).tuples()) if ids else {}
+
+    return {'data': [records[x] for x in ids], 'paginator': {'total_pages': total_pages}}
+
+def index_media(rows, category=None):
+    records = [projection.media(x) for x in rows if not x.get('is_collection')]
+    if not records:
+        return
+
+    ids      = [x['id'] for x in records]
+    existing = dict(MediaIndex.select(MediaIndex.docid, MediaIndex.category).where(MediaIndex.docid << ids).tuples())
+
+    data = []
+    for record in records:
+        categories = set(existing.get(record['id'], u'').split())
+        if category:
+            categories.add(category)
+
+        data.append({
+            'docid': record['id'],
+            'title': record.get('title') or u'',
+            'description': record.get('description') or u'',
+            'category': u' '.join(sorted(categories)),
+            'data': record,
+        })
+
+    with database.db.atomic():
+        MediaIndex.delete_where(MediaIndex.docid << ids)
+        MediaIndex.insert_many(data)
+
+def set_bookmarked(id, bookmarked):
+    id = int(id)
+
+    with database.db.atomic():
+        for model, field in ((Media, Media.id), (MediaIndex, MediaIndex.docid)):
+            for row in model.select().where(field == id):
+                row.data['user_media'] = dict(row.data.get('user_media') or {}, is_bookmarked=bookmarked)
+                model.update(data=row.data).where(field == id).execute()
+
+# another user's watchlist flags are replaced by a full sync
+def restart():
+    SyncState.delete_where(SyncState.key == STATE_KEY)
+
+def sync(api, budget=MIRROR_SYNC_BUDGET):
+    state = SyncState.get_value(STATE_KEY)
+
+    if not state or (not state['steps'] and time.time() - state['completed'] > MIRROR_SYNC_INTERVAL):
+        log.debug('Mirror: Starting catalog sync')
+        state = {'started': time.time(), 'completed': None, 'steps': [['categories', None, 1], ['collections', None, 1], ['sections', None, 1]]}
+    elif state['steps']:
+        log.debug('Mirror: Resuming catalog sync from {}'.format(state['steps'][0]))
+    else:
+        return
+
+    start = time.time()
+    while state['steps'] and time.time() - start < budget:
+        try:
+            _sync_step(api, state)
+        except Exception as e:
+            log.exception(e)
+            log.debug('Mirror: Sync stopped at {}'.format(state['steps'][0]))
+            return
+
+    if state['steps']:
+        log.debug('Mirror: Budget used, {} steps remaining'.format(len(state['steps'])))
+    else:
+        log.debug('Mirror: Sync completed in {}s'.format(int(time.time() - state['started'])))
+
+def _sync_step(api, state):
+    name, arg, page = state['steps'][0]
+
+    if name == 'categories':
+        rows = api.categories(_skip_cache=True)
+        data = [{'id': row['id'], 'position': idx, 'data': row} for idx, row in enumerate(rows)]
+
+        with database.db.atomic():
+            Category.truncate()
+            Category.insert_many(data)
+            state['steps'].extend([['media', x, 1] for x in _leaf_categories(rows)])
+            _checkpoint(state, done=True)
+
+    elif name == 'collections':
+        data = api.collections(page=page, _skip_cache=True)
+        rows = [{'id': row['id'], 'position': (page-1) * PAGE_SIZE + idx, 'data': row} for idx, row in enumerate(data['data'])]
+        done = page >= int(data['paginator']['total_pages'])
+
+        with database.db.atomic():
+            if page == 1:
+                Collection.truncate()
+                SyncState.delete_where(SyncState.key == 'collections')
+
+            Collection.replace_many(rows)
+            if done:
+                SyncState.set(key='collections', value=time.time())
+
+            _checkpoint(state, done)
+
+    elif name == 'sections':
+        rows = api.sections(FEATURED_ID)
+        data = [{'id': row['id'], 'position': idx, 'data': projection.section(row)} for idx, row in enumerate(rows)]
+
+        with database.db.atomic():
+            Section.truncate()
+            Section.insert_many(data)
+            _checkpoint(state, done=True)
+
+    elif name == 'media':
+        data = api.filter_media_uncached('category', arg, page=page)
+        rows = [{'category': arg, 'position': (page-1) * PAGE_SIZE + idx, 'id': row['id'], 'data': projection.media(row)} for idx, row in enumerate(data['data'])]
+        done = page >= int(data['paginator']['total_pages'])
+        key  = _category_key(arg)
+
+        with database.db.atomic():
+            if page == 1:
+                Media.delete_where(Media.category == arg)
+                SyncState.delete_where(SyncState.key == key)
+
+            Media.replace_many(rows)
+            index_media(data['data'], category=arg)
+            if done:
+                SyncState.set(key=key, value=time.time())
+
+            _checkpoint(state, done)
+
+def _checkpoint(state, done):
+    if done:
+        state['steps'].pop(0)
+    else:
+        state['steps'][0][2] += 1
+
+    if not state['steps']:
+        state['completed'] = time.time()
+        SyncState.set(key=CATALOG_KEY, value=state['completed'])
+
+    SyncState.set(key=STATE_KEY, value=state)
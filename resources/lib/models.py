@@ -0,0 +1,64 @@
+from matthuisman import database, peewee
+
+class Category(database.Model):
+    id       = peewee.IntegerField(primary_key=True)
+    position = peewee.IntegerField()
+    data     = database.PickledField()
+
+class Collection(database.Model):
+    id       = peewee.IntegerField(primary_key=True)
+    position = peewee.IntegerField(index=True)
+    data     = database.PickledField()
+
+class Section(database.Model):
+    id       = peewee.IntegerField(primary_key=True)
+    position = peewee.IntegerField()
+    data     = database.PickledField()
+
+class Media(database.Model):
+    category = peewee.TextField()
+    position = peewee.IntegerField()
+    id       = peewee.IntegerField(index=True)
+    data     = database.PickledField()
+
+    class Meta:
+        primary_key = peewee.CompositeKey('category', 'position')
+
+class MediaIndex(database.Model):
+    checksum = 'unicode61'
+
+    docid       = peewee.IntegerField(primary_key=True)
+    title       = peewee.TextField()
+    description = peewee.TextField()
+    category    = peewee.TextField()
+    data        = database.PickledField()
+
+    @classmethod
+    def create_table(cls, safe=True, **options):
+        #full text index when sqlite has fts4, otherwise a plain table searched with LIKE.
+        #unicode61 folds case beyond ascii (simple, the fallback for old sqlite, only folds A-Z).
+        for tokenize in ('unicode61', 'simple'):
+            try:
+                database.db.execute_sql('CREATE VIRTUAL TABLE IF NOT EXISTS "{}" USING fts4(title, description, category, data, notindexed=data, tokenize={})'.format(cls.table_name(), tokenize))
+                return
+            except peewee.OperationalError:
+                pass
+
+        super(MediaIndex, cls).create_table(safe, **options)
+
+    @classmethod
+    def is_fts(cls):
+        cursor = database.db.execute_sql('SELECT sql FROM sqlite_master WHERE name = ?', (cls.table_name(),))
+        row = cursor.fetchone()
+        return bool(row and 'VIRTUAL' in row[0].upper())
+
+class SyncState(database.Model):
+    key   = peewee.TextField(primary_key=True)
+    value = database.PickledField()
+
+    @classmethod
+    def get_value(cls, key, default=None):
+        row = cls.get_or_none(cls.key == key)
+        return row.value if row else default
+
+database.register(Category, Collection, Section, Media, MediaIndex, SyncState)
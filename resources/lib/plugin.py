@@ -1,10 +1,10 @@
-from matthuisman import plugin, gui, userdata, signals, inputstream, settings
+from matthuisman import plugin, gui, userdata, signals, settings, prefetch
 from matthuisman.log import log
 from matthuisman.exceptions import PluginError
 
 from .api import API
 from .language import _
-from .constants import PREVIEW_LENGTH
+from .constants import PREVIEW_LENGTH, FEATURED_ID
 
 api = API()
 
@@ -13,6 +13,29 @@ def before_dispatch():
     api.new_session()
     plugin.logged_in = api.logged_in
 
+    if settings.getBool('preconnect', True) and plugin.is_interactive():
+        api.preconnect()
+
+@signals.on(signals.AFTER_DISPATCH)
+def after_dispatch():
+    num_requests, num_connections = api.pool_stats()
+    if num_requests:
+        log.debug('Connection Pool: {} requests over {} connections ({:.0f}% reused)'.format(
+            num_requests, num_connections, 100.0 * (num_requests - num_connections) / num_requests))
+
+@signals.on(signals.ON_SERVICE)
+def service():
+    if settings.getBool('use_mirror', False):
+        from . import mirror
+        mirror.sync(api)
+
+def _mirror(func_name, *args, **kwargs):
+    if not settings.getBool('use_mirror', False):
+        return None
+
+    from . import mirror
+    return getattr(mirror, func_name)(*args, **kwargs)
+
 @plugin.route('')
 def index(**kwargs):
     folder = plugin.Folder()
@@ -92,7 +115,7 @@ def _search_category(rows, id):
 def categories(id=None, **kwargs):
     folder = plugin.Folder(title=_.CATEGORIES)
 
-    rows = api.categories()
+    rows = _mirror('categories') or api.categories()
     if id:
         row = _search_category(rows, id)
         if not row:
@@ -121,7 +144,11 @@ def categories(id=None, **kwargs):
 def media(title, filterby, term, page=1, **kwargs):
     page = int(page)
 
-    data = api.filter_media(filterby, term, page=page)
+    data = _mirror('filter_media', filterby, term, page=page)
+    from_api = not data
+    if from_api:
+        data = api.filter_media(filterby, term, page=page)
+
     total_pages = int(data['paginator']['total_pages'])
 
     folder = plugin.Folder(title=title)
@@ -135,6 +162,8 @@ def media(title, filterby, term, page=1, **kwargs):
             label = _(_.NEXT_PAGE, next_page=page+1),
             path  = plugin.url_for(media, title=title, filterby=filterby, term=term, page=page+1),
         )
+        if from_api:
+            prefetch.start(api.filter_media, filterby, term, page=page+1)
 
     return folder
 
@@ -142,7 +171,11 @@ def media(title, filterby, term, page=1, **kwargs):
 def collections(page=1, **kwargs):
     page = int(page)
 
-    data = api.collections(page=page)
+    data = _mirror('collections', page=page)
+    from_api = not data
+    if from_api:
+        data = api.collections(page=page)
+
     total_pages = int(data['paginator']['total_pages'])
 
     folder = plugin.Folder(title=_.COLLECTIONS)
@@ -160,6 +193,8 @@ def collections(page=1, **kwargs):
             label = _(_.NEXT_PAGE, next_page=page+1),
             path  = plugin.url_for(collections, page=page+1),
         )
+        if from_api:
+            prefetch.start(api.collections, page=page+1)
 
     return folder
 
@@ -189,7 +224,7 @@ def collection(id, **kwargs):
 def featured(id=None, **kwargs):
     folder = plugin.Folder(title=_.FEATURED)
 
-    rows = api.sections(7)
+    rows = _mirror('sections') or api.sections(FEATURED_ID)
 
     if id:
         for row in rows:
@@ -235,7 +270,12 @@ def search(query=None, page=1, **kwargs):
             return
         userdata.set('search', query)
 
-    data = api.filter_media('keyword', query, page=page)
+    data = _mirror('search', query, page=page)
+    from_api = not data
+    if from_api:
+        data = api.filter_media('keyword', query, page=page)
+        _mirror('index_media', data['data'])
+
     total_pages = int(data['paginator']['total_pages'])
 
     folder = plugin.Folder(title=_(_.SEARCH_FOR, query=query, page=page, total_pages=total_pages))
@@ -249,6 +289,8 @@ def search(query=None, page=1, **kwargs):
             label = _(_.NEXT_PAGE, next_page=page+1),
             path  = plugin.url_for(search, query=query, page=page+1),
         )
+        if from_api:
+            prefetch.start(api.filter_media, 'keyword', query, page=page+1)
 
     return folder
 
@@ -269,6 +311,7 @@ def watchlist(page=1, **kwargs):
             label = _(_.NEXT_PAGE, next_page=page+1),
             path  = plugin.url_for(watchlist, page=page+1),
         )
+        prefetch.start(api.filter_media, 'bookmarked', page=page+1)
 
     return folder
 
@@ -276,12 +319,14 @@ def watchlist(page=1, **kwargs):
 @plugin.route()
 def add_watchlist(id, title, **kwargs):
     api.set_user_media(id, is_bookmarked='true')
+    _mirror('set_bookmarked', id, True)
     gui.notification(title, heading=_.WATCHLIST_ADDED)
     gui.refresh()
 
 @plugin.route()
 def remove_watchlist(id, title, **kwargs):
     api.set_user_media(id, is_bookmarked='false')
+    _mirror('set_bookmarked', id, False)
     gui.notification(title, heading=_.WATCHLIST_REMOVED)
     gui.refresh()
 
@@ -300,8 +345,9 @@ def watching(page=1, **kwargs):
     if total_pages > page:
         folder.add_item(
             label = _(_.NEXT_PAGE, next_page=page+1),
-            path  = plugin.url_for(watchlist, page=page+1),
+            path  = plugin.url_for(watching, page=page+1),
         )
+        prefetch.start(api.filter_media, 'watching', page=page+1)
 
     return folder
 
@@ -318,10 +364,13 @@ def login(**kwargs):
         return
 
     api.login(username=username, password=password)
+    _mirror('restart')
     gui.refresh()
 
 @plugin.route()
 def play(id, **kwargs):
+    from matthuisman import inputstream
+
     data = api.media(id)
     item = _process_media(data)
 
@@ -331,6 +380,9 @@ def play(id, **kwargs):
     item.path = data['encodings'][0]['master_playlist_url']
     item.inputstream = inputstream.HLS()
 
+    #playing moves the item into continue watching
+    api.clear_watching()
+
     return item
 
 @plugin.route()
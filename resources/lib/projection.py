@@ -0,0 +1,50 @@
+# Cut API rows down to the fields the routes read before they are cached
+
+MEDIA_FIELDS      = ('id', 'title', 'description', 'duration', 'image_medium', 'year_produced', 'is_free',
+                        'is_collection', 'is_child_friendly', 'is_published', 'is_numbered_series')
+CATEGORY_FIELDS   = ('id', 'label', 'name', 'image_url')
+COLLECTION_FIELDS = ('id', 'title', 'description', 'image_url')
+SECTION_FIELDS    = ('id', 'type', 'label', 'name', 'model_id', 'description', 'image_url', 'background_url')
+
+def _pick(row, fields):
+    return dict((key, row[key]) for key in fields if key in row)
+
+def media(row):
+    record = _pick(row, MEDIA_FIELDS)
+
+    user_media = row.get('user_media')
+    if user_media:
+        record['user_media'] = {'is_bookmarked': user_media.get('is_bookmarked', False)}
+
+    return record
+
+def category(row):
+    record = _pick(row, CATEGORY_FIELDS)
+
+    subcategories = row.get('subcategories')
+    if subcategories:
+        record['subcategories'] = [category(x) for x in subcategories]
+
+    return record
+
+def categories(rows):
+    return [category(x) for x in rows]
+
+def collection(row):
+    return _pick(row, COLLECTION_FIELDS)
+
+def paginated(data, project):
+    return {
+        'paginator': {'total_pages': data['paginator']['total_pages']},
+        'data': [project(x) for x in data['data']],
+    }
+
+def featured(data):
+    record = dict(data)
+    record['data'] = [media(x) if isinstance(x, dict) else x for x in data.get('data', [])]
+    return record
+
+def section(row):
+    record = _pick(row, SECTION_FIELDS)
+    record['media'] = [media(x) for x in row.get('media', [])]
+    return record
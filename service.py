@@ -0,0 +1,3 @@
+from resources.lib.matthuisman import service
+
+service.run()
@@ -0,0 +1,76 @@
+# Mirror search against a throwaway profile, using the Kodi stand-ins from benchmarks/stubs.
+#   python2 -m unittest discover tests
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+ROOT_DIR  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'stubs')
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, STUBS_DIR)
+
+PROFILE = tempfile.mkdtemp(prefix='kodi-test-')
+os.environ['BENCH_KODI_ROOT'] = PROFILE
+
+from resources.lib import mirror
+from resources.lib.models import Media, MediaIndex, SyncState
+from resources.lib.matthuisman import database
+
+def tearDownModule():
+    database.close()
+    shutil.rmtree(PROFILE, ignore_errors=True)
+
+class MirrorSearchTest(unittest.TestCase):
+    def setUp(self):
+        MediaIndex.truncate()
+        SyncState.set(key=mirror.CATALOG_KEY, value=1)
+
+        mirror.index_media([
+            {'id': 1, 'title': u'Measuring the \xe5ngstr\xf6m', 'description': u''},
+            {'id': 2, 'title': u'Deep Space', 'description': u''},
+            {'id': 3, 'title': u'\xc9TOILES', 'description': u''},
+        ])
+
+    def _ids(self, query):
+        data = mirror.search(query)
+        return [x['id'] for x in data['data']] if data else []
+
+    def test_non_ascii_case_folding(self):
+        self.assertEqual(self._ids(u'\xc5NGSTR\xd6M'), [1])
+
+    def test_non_ascii_title_folding(self):
+        self.assertEqual(self._ids(u'\xe9toiles'), [3])
+
+    def test_utf8_query(self):
+        # Kodi hands py2 addons utf-8 encoded input
+        self.assertEqual(self._ids(u'\xc5NGSTR\xd6M'.encode('utf-8')), [1])
+
+    def test_prefix(self):
+        self.assertEqual(self._ids('spa'), [2])
+
+class MirrorBookmarkTest(unittest.TestCase):
+    def setUp(self):
+        Media.truncate()
+        Media.insert_many([
+            {'category': 'space', 'position': 0, 'id': 1, 'data': {'id': 1, 'title': u'One', 'user_media': {'is_bookmarked': True}}},
+            {'category': 'space', 'position': 1, 'id': 2, 'data': {'id': 2, 'title': u'Two'}},
+        ])
+        SyncState.set(key='category.space', value=1)
+
+    def _bookmarked(self):
+        rows = mirror.filter_media('category', 'space')['data']
+        return dict((x['id'], (x.get('user_media') or {}).get('is_bookmarked', False)) for x in rows)
+
+    def test_user_media_is_kept(self):
+        self.assertEqual(self._bookmarked(), {1: True, 2: False})
+
+    def test_set_bookmarked(self):
+        mirror.set_bookmarked('1', False)
+        mirror.set_bookmarked('2', True)
+        self.assertEqual(self._bookmarked(), {1: False, 2: True})
+
+if __name__ == '__main__':
+    unittest.main()